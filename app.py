@@ -1,14 +1,14 @@
-from langchain_openai import ChatOpenAI
 from datetime import datetime, timedelta
 import streamlit as st
 import os
 import logging
 from dotenv import load_dotenv
 from streamlit_calendar import calendar
-from scrap_edt import get_edt
+from scrap_edt import load_event_store, schedule_version
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage, SystemMessage
 from tools import load_and_save_to_faiss_json,fetch_and_concatenate_documents
+from llm import ResponseCache, get_chat_model, response_cache, stream_chat
 load_dotenv()
 
 ##################SETUP DES LOGS###################
@@ -61,15 +61,67 @@ Réponse : Le début de votre cours de Mathématiques est le 10 janvier.
 """
     
 
+def course_color(nom_cours):
+    """Couleur d'un cours dans le calendrier selon son type (TD, TP, CM)."""
+    if "TD" and "Td" in nom_cours:
+        return "#32a852"  # TD en vert clair
+    elif "TP" and "Tp" in nom_cours:
+        return "#ffb22e"  # TP en orange clair
+    elif "CM" and "Cm" in nom_cours:
+        return "#4287f5"  # CM en bleu clair
+    return "gray"  # Sinon par défaut en gris
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def calendar_events(version, _store):
+    """
+    Construit une fois par version d'emploi du temps les événements du calendrier.
+
+    Le résultat est partagé entre les reruns et les sessions (il n'est pas copié) :
+    l'événement d'indice i correspond à la position i du store.
+
+    Args:
+        version (str): La version du store (clé du cache).
+        _store (EventStore): L'emploi du temps.
+
+    Returns:
+        list[dict]: Les événements au format FullCalendar, dans l'ordre du store.
+    """
+    colors = [course_color(nom_cours) for nom_cours in _store.courses]
+    return [
+        {
+            'start': cours['début'],
+            'end': cours['fin'],
+            'title': cours['nom_cours'],
+            'description': cours['description'],
+            'color': colors[course_id],
+        }
+        for cours, course_id in zip(_store.records(), _store.course_ids)
+    ]
+
+
 def generate_response(querry_text, user_id,list_of_dates):
-    
+    """
+    Prépare le contexte et lance la génération de la réponse en streaming.
+
+    Une même question posée par le même étudiant sur les mêmes dates est servie
+    depuis le cache tant que son emploi du temps n'a pas changé.
+
+    Returns:
+        Iterator[str]: Les morceaux de la réponse, à afficher avec `st.write_stream`.
+    """
+    cache_key = ResponseCache.key(querry_text, user_id, list_of_dates, schedule_version(user_id))
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        logging.info("Réponse servie depuis le cache")
+        return iter([cached])
+
     try:
-        # Utilisez model_name au lieu de model
-        chat_model = ChatOpenAI(model_name="gpt-4o-mini")
-        logging.info(f"Modèle initialisé")
+        # Client partagé : les connexions sont réutilisées d'une question à l'autre
+        chat_model = get_chat_model()
     except Exception as e:
         logging.error(f"Erreur lors de l'initialisation du modèle : {repr(e)}")
-        return "Erreur lors de l'initialisation du modèle."
+        return iter(["Erreur lors de l'initialisation du modèle."])
 
     # Récupère les documents pertinents à partir de FAISS
     context=fetch_and_concatenate_documents(querry_text,user_id=user_id,list_of_dates=list_of_dates,top_k=25)
@@ -84,14 +136,9 @@ def generate_response(querry_text, user_id,list_of_dates):
         HumanMessage(content=prompt)
     ]
 
-    # Utilise le modèle de chat pour générer la réponse
-    try:
-        response = chat_model(messages=messages)
-        return response.content  # Renvoie le contenu de la réponse générée
-    except Exception as e:
-        logging.error(f"Erreur lors de la génération de la réponse: {repr(e)}")
-        return "Erreur lors de la génération de la réponse."
-    
+    # Utilise le modèle de chat pour générer la réponse, morceau par morceau
+    return stream_chat(chat_model, messages, on_complete=lambda response: response_cache.put(cache_key, response))
+
 # Fonction principale pour la page web
 def main():
 
@@ -105,38 +152,22 @@ def main():
     if st.button("Valider"):
         if user_id:
             try:
-                cours = get_edt(user_id)
-                st.session_state.edt = cours
+                # Un seul téléchargement (conditionnel) par clic : l'indexation enregistre aussi l'EventStore
+                load_and_save_to_faiss_json(user_id)
+                # Emploi du temps en colonnes : plus compact en session que des listes de dictionnaires
+                st.session_state.edt = load_event_store(user_id)
                 st.success("Identifiant validé ! Voici votre emploi du temps :")
-                load_and_save_to_faiss_json()
                 
             except Exception as e:
                 st.error(str(e))
         else:
             st.warning("Veuillez entrer un identifiant valide.")
 
-    # Définition des événements avec les couleurs pour TD, TP, CM
+    # Événements construits une fois par version de l'emploi du temps : tous sont envoyés,
+    # le composant (streamlit-calendar 1.4.0) ne signale pas la navigation (datesSet)
     if st.session_state.edt:
-        events = []
-        for cours in st.session_state.edt:
-            
-            color = ""
-            if "TD" and "Td" in cours['nom_cours']:
-                color = "#32a852"  # TD en vert clair
-            elif "TP" and "Tp" in cours['nom_cours']:
-                color = "#ffb22e"  # TP en orange clair
-            elif "CM" and "Cm" in cours['nom_cours']:
-                color = "#4287f5"  # CM en bleu clair
-            else:
-                color = "gray"  # Sinon par défaut en gris
-
-            events.append({
-                'start': cours['début'],
-                'end': cours['fin'],
-                'title': cours['nom_cours'],
-                'description': cours['description'],
-                'color': color
-            })
+        store = st.session_state.edt
+        events = calendar_events(store.version, store)
     else:
         events = []
 
@@ -220,11 +251,16 @@ def main():
         st.session_state.messages.append({"role": "user", "content": prompt})
 
         # Here you would typically generate a response from your AI model
-        response = generate_response(prompt,list_of_dates=liste_dates,user_id=user_id)
+        stream = generate_response(prompt,list_of_dates=liste_dates,user_id=user_id)
 
-        # Display assistant response in chat message container
+        # Display assistant response in chat message container, au fur et à mesure
         with st.chat_message("assistant"):
-            st.markdown(response)
+            try:
+                response = st.write_stream(stream)
+            finally:
+                # Si Streamlit interrompt le script (l'utilisateur quitte la page), la requête est fermée
+                if hasattr(stream, "close"):
+                    stream.close()
         # Add assistant response to chat history
         st.session_state.messages.append({"role": "assistant", "content": response})
 
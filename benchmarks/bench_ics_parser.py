@@ -0,0 +1,98 @@
+"""Compare le parseur ICS maison (ics_parser.iter_events) à la bibliothèque ics.
+
+Usage :
+    python benchmarks/bench_ics_parser.py --events 3000 --repeat 5
+"""
+import argparse
+from datetime import datetime, timedelta
+import os
+import sys
+import time
+
+import pytz
+from ics import Calendar
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ics_parser import iter_events  # noqa: E402
+
+LOCAL_TZ = pytz.timezone("Pacific/Noumea")
+
+
+def generate_ics(nb_events):
+    """Génère un flux ICS synthétique proche de celui de l'université."""
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//bench//EN"]
+    base = datetime(2024, 2, 18, 20, 0)
+    for i in range(nb_events):
+        start = base + timedelta(days=i // 5, hours=2 * (i % 5))
+        end = start + timedelta(hours=2)
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{i}@bench",
+            "DTSTAMP:20240101T000000Z",
+            f"DTSTART:{start:%Y%m%dT%H%M%S}Z",
+            f"DTEND:{end:%Y%m%dT%H%M%S}Z",
+            f"SUMMARY:Cours {i % 23} (TD Groupe {i % 4})",
+            f"DESCRIPTION:Cours {i % 23} (Licence 2 Informatique)\\nProfesseur {i % 11}\\nSalle {i % 40}",
+            f"LOCATION:Bâtiment {i % 6}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def with_ics(ics_content):
+    """Chemin historique de scrap_edt : ics.Calendar puis astimezone/strftime."""
+    return [
+        (
+            event.begin.astimezone(LOCAL_TZ).strftime('%Y-%m-%d %H:%M'),
+            event.end.astimezone(LOCAL_TZ).strftime('%Y-%m-%d %H:%M'),
+            event.name,
+            event.description,
+        )
+        for event in Calendar(ics_content).events
+    ]
+
+
+def with_iter_events(ics_content):
+    return [
+        (
+            event["begin"].strftime('%Y-%m-%d %H:%M'),
+            event["end"].strftime('%Y-%m-%d %H:%M'),
+            event["name"],
+            event["description"],
+        )
+        for event in iter_events(ics_content, LOCAL_TZ)
+    ]
+
+
+def best_time(function, ics_content, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(ics_content)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=3000, help="Nombre de VEVENT du flux synthétique")
+    parser.add_argument("--repeat", type=int, default=5, help="Nombre de mesures (le meilleur temps est retenu)")
+    args = parser.parse_args()
+
+    ics_content = generate_ics(args.events)
+    ics_time, ics_result = best_time(with_ics, ics_content, args.repeat)
+    fast_time, fast_result = best_time(with_iter_events, ics_content, args.repeat)
+
+    if sorted(ics_result) != sorted(fast_result):
+        print("ERREUR : les deux parseurs ne produisent pas les mêmes événements")
+        sys.exit(1)
+
+    print(f"{args.events} événements ({len(ics_content) / 1024:.0f} Kio)")
+    print(f"ics.Calendar      : {ics_time * 1000:9.1f} ms")
+    print(f"iter_events       : {fast_time * 1000:9.1f} ms")
+    print(f"accélération      : {ics_time / fast_time:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Compare les types d'index FAISS (faiss_index) à l'index plat sur des emplois du temps synthétiques.
+
+Pour chaque type et chaque valeur de paramètre de recherche (nprobe pour IVF,
+efSearch pour HNSW), affiche le temps de construction (entraînement compris),
+le recall@k par rapport à la recherche exacte de l'index plat, le nombre de
+requêtes par seconde (une requête à la fois, sur un thread) et la taille de
+l'index sérialisé. Pour IVF-PQ, une seconde ligne mesure le reclassement exact
+des candidats fait par DiskVectorStore.
+
+Les vecteurs viennent par défaut de HashingEmbeddings appliqué à des
+événements synthétiques ; --random utilise des vecteurs aléatoires regroupés
+en clusters, de la dimension des embeddings OpenAI.
+
+Usage :
+    python benchmarks/bench_index_types.py --docs 50000 --queries 500 --k 5
+    python benchmarks/bench_index_types.py --random --dimension 1536 --nprobe 4 16 64 --ef-search 16 64 256
+"""
+import argparse
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from faiss_index import FAISS_PQ_RERANK, INDEX_TYPES, build_index, exact_top_k, index_config, search_parameters  # noqa: E402
+from local_embeddings import HashingEmbeddings  # noqa: E402
+
+
+def generate_events(nb_events, seed=0):
+    """Génère des textes d'événements proches de ceux indexés par faiss_handler."""
+    rng = np.random.default_rng(seed)
+    texts = []
+    for i in range(nb_events):
+        cours, groupe, prof, salle = rng.integers(60), rng.integers(6), rng.integers(40), rng.integers(80)
+        jour, heure = 1 + i % 28, 7 + 2 * rng.integers(6)
+        texts.append(
+            f"Cours {cours} (TD Groupe {groupe}) avec Professeur {prof} en salle {salle}, "
+            f"le 2024-03-{jour:02d} de {heure:02d}:00 à {heure + 2:02d}:00"
+        )
+    return texts
+
+
+def generate_queries(nb_queries, seed=1):
+    rng = np.random.default_rng(seed)
+    return [
+        f"Quand ai-je le cours {rng.integers(60)} avec le professeur {rng.integers(40)} ?"
+        for _ in range(nb_queries)
+    ]
+
+
+def random_vectors(nb_vectors, dimension, seed=0, nb_clusters=200):
+    """Vecteurs aléatoires regroupés autour de quelques centres, normalisés comme des embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((nb_clusters, dimension), dtype="float32")
+    vectors = centers[rng.integers(nb_clusters, size=nb_vectors)] + 0.5 * rng.standard_normal((nb_vectors, dimension), dtype="float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def timed_search(index, queries, k, params, vectors=None):
+    """Recherche requête par requête (comme l'application) ; avec `vectors`, reclasse
+    k * FAISS_PQ_RERANK candidats avec les vecteurs exacts comme DiskVectorStore."""
+    threads = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(1)
+    found = []
+    start = time.perf_counter()
+    for query in queries:
+        query = query[None, :]
+        _, positions = index.search(query, k if vectors is None else k * FAISS_PQ_RERANK, params=params)
+        positions = positions[0][positions[0] != -1]
+        found.append(positions if vectors is None else exact_top_k(query, positions, vectors[positions], k))
+    qps = len(queries) / (time.perf_counter() - start)
+    faiss.omp_set_num_threads(threads)
+    return found, qps
+
+
+def recall_at_k(found, expected):
+    return np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, expected)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=50000, help="Nombre d'événements indexés")
+    parser.add_argument("--queries", type=int, default=500, help="Nombre de requêtes")
+    parser.add_argument("--k", type=int, default=5, help="Nombre de résultats par requête")
+    parser.add_argument("--types", nargs="*", default=[t for t in INDEX_TYPES if t != "flat"], help="Types d'index comparés à l'index plat")
+    parser.add_argument("--nprobe", type=int, nargs="*", default=[1, 4, 16, 64], help="Valeurs de nprobe testées (IVF)")
+    parser.add_argument("--ef-search", type=int, nargs="*", default=[16, 64, 256], help="Valeurs de efSearch testées (HNSW)")
+    parser.add_argument("--random", action="store_true", help="Vecteurs aléatoires au lieu d'événements embeddés")
+    parser.add_argument("--dimension", type=int, default=1536, help="Dimension des vecteurs aléatoires")
+    args = parser.parse_args()
+
+    if args.random:
+        vectors = random_vectors(args.docs, args.dimension)
+        queries = random_vectors(args.queries, args.dimension, seed=1)
+    else:
+        embeddings = HashingEmbeddings()
+        vectors = np.asarray(embeddings.embed_documents(generate_events(args.docs)), dtype="float32")
+        queries = np.asarray(embeddings.embed_documents(generate_queries(args.queries)), dtype="float32")
+    print(f"{len(vectors)} vecteurs de dimension {vectors.shape[1]}, {len(queries)} requêtes, k={args.k}")
+
+    start = time.perf_counter()
+    flat, _, _ = build_index(vectors, index_config("flat"))
+    build_time = time.perf_counter() - start
+    expected, flat_qps = timed_search(flat, queries, args.k, None)
+    flat_size = faiss.serialize_index(flat).nbytes / 1e6
+
+    print(f"{'index':<10}{'paramètre':<14}{'build':>9}{'recall@' + str(args.k):>11}{'QPS':>10}{'mémoire':>12}")
+    print(f"{'flat':<10}{'-':<14}{build_time:>8.2f}s{1.0:>11.3f}{flat_qps:>10.0f}{flat_size:>10.1f}Mo")
+    for index_type in args.types:
+        config = index_config(index_type)
+        start = time.perf_counter()
+        index, _, info = build_index(vectors, config)
+        build_time = time.perf_counter() - start
+        if info["config"]["type"] != index_type:
+            print(f"{index_type:<10}trop peu de vecteurs : index plat utilisé (FAISS_APPROX_MIN_VECTORS)")
+            continue
+        size = faiss.serialize_index(index).nbytes / 1e6
+        if index_type == "hnsw":
+            settings = [(f"efSearch={ef}", search_parameters(index, ef_search=ef)) for ef in args.ef_search]
+        else:
+            settings = [(f"nprobe={nprobe}", search_parameters(index, nprobe=nprobe)) for nprobe in args.nprobe]
+        for label, params in settings:
+            found, qps = timed_search(index, queries, args.k, params)
+            print(
+                f"{index_type:<10}{label:<14}{build_time:>8.2f}s{recall_at_k(found, expected):>11.3f}"
+                f"{qps:>10.0f}{size:>10.1f}Mo"
+            )
+            if index_type == "ivf_pq":
+                # Les vecteurs exacts restent sur disque (vectors.npy) : ils ne comptent pas dans la mémoire
+                found, qps = timed_search(index, queries, args.k, params, vectors)
+                print(
+                    f"{'  +rerank':<10}{label:<14}{build_time:>8.2f}s{recall_at_k(found, expected):>11.3f}"
+                    f"{qps:>10.0f}{size:>10.1f}Mo"
+                )
+
+
+if __name__ == "__main__":
+    main()
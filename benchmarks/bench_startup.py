@@ -0,0 +1,113 @@
+"""Mesure le démarrage à froid des points d'entrée : temps d'import et temps de la première requête.
+
+Chaque mesure est faite dans un nouvel interpréteur Python, comme au démarrage
+d'un worker Streamlit :
+  - app.py, pages/1_reunion.py : import des modules dont dépend la page, puis
+    premier rendu du script avec streamlit.testing (AppTest) ;
+  - guard.py : `import guard`, puis validation d'un premier message refusé par
+    les vérifications locales (sans appel réseau).
+
+Le code de sortie vaut 1 si un point d'entrée échoue ou dépasse le budget.
+
+Usage :
+    python benchmarks/bench_startup.py --repeat 3 --budget 5
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ["app.py", "pages/1_reunion.py", "guard.py"]
+FIRST_MESSAGE = "Quel temps fait-il à Nouméa ?"  # Hors sujet : refusé sans appel réseau
+
+
+def import_statements(path):
+    """Retourne le code des imports de premier niveau d'un script."""
+    with open(path, "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read())
+    return ast.unparse(ast.Module([node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))], []))
+
+
+def measure(entry_point):
+    """Mesure un point d'entrée dans le processus courant (appelé dans un sous-processus)."""
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    result = {"entry_point": entry_point, "error": None}
+    try:
+        if entry_point == "guard.py":
+            start = time.perf_counter()
+            import guard
+            result["import"] = time.perf_counter() - start
+            start = time.perf_counter()
+            guard.validate_input(FIRST_MESSAGE)
+            result["first_request"] = time.perf_counter() - start
+        else:
+            from streamlit.testing.v1 import AppTest
+
+            start = time.perf_counter()
+            exec(import_statements(entry_point), {"__name__": "bench_startup"})
+            result["import"] = time.perf_counter() - start
+            start = time.perf_counter()
+            app = AppTest.from_file(os.path.join(ROOT, entry_point), default_timeout=120).run()
+            result["first_request"] = time.perf_counter() - start
+            if app.exception:
+                result["error"] = app.exception[0].message
+    except Exception as e:
+        result["error"] = repr(e)
+    return result
+
+
+def run_child(entry_point):
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", entry_point],
+        capture_output=True, text=True, cwd=ROOT,
+    )
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return {"entry_point": entry_point, "error": completed.stderr.strip().splitlines()[-1:] or "sortie vide"}
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de démarrages à froid par point d'entrée (la médiane est retenue)")
+    parser.add_argument("--budget", type=float, default=5.0, help="Budget de démarrage (import + première requête), en secondes")
+    parser.add_argument("--entry-points", nargs="*", default=ENTRY_POINTS, help="Points d'entrée à mesurer")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child)))
+        return
+
+    failed = False
+    print(f"{'entrée':<22}{'import':>10}{'1re requête':>14}{'total':>10}")
+    for entry_point in args.entry_points:
+        runs = [run_child(entry_point) for _ in range(args.repeat)]
+        errors = [run["error"] for run in runs if run["error"]]
+        timed = [run for run in runs if "first_request" in run]
+        if not timed:
+            failed = True
+            print(f"{entry_point:<22}ERREUR : {errors[0]}")
+            continue
+        import_time = statistics.median(run["import"] for run in timed)
+        first_request = statistics.median(run["first_request"] for run in timed)
+        total = import_time + first_request
+        over_budget = total > args.budget
+        failed = failed or over_budget or bool(errors)
+        print(
+            f"{entry_point:<22}{import_time:>9.2f}s{first_request:>13.2f}s{total:>9.2f}s"
+            + ("  HORS BUDGET" if over_budget else "")
+            + (f"  (erreur : {errors[0]})" if errors else "")
+        )
+    print(f"budget : {args.budget:.1f}s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+from collections import defaultdict
+from datetime import date
+import logging
+import os
+
+try:
+    import tiktoken
+except ImportError:  # Sans tiktoken, le nombre de tokens est estimé
+    tiktoken = None
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))  # Tokens maximum par emploi du temps dans un prompt
+JOURS = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+
+_encoding = None  # Tokenizer tiktoken, chargé au premier appel (False s'il est indisponible)
+
+
+def count_tokens(text, model="gpt-4o-mini"):
+    """
+    Compte les tokens d'un texte pour le modèle donné.
+
+    Utilise tiktoken s'il est disponible, sinon estime environ 4 caractères par token.
+
+    Args:
+        text (str): Le texte.
+        model (str): Le modèle dont on utilise le tokenizer.
+
+    Returns:
+        int: Le nombre de tokens.
+    """
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # tiktoken télécharge son vocabulaire au premier usage : hors ligne, on estime
+            logging.warning(f"Tokenizer indisponible, estimation du nombre de tokens : {repr(e)}")
+            _encoding = False
+    if not _encoding:
+        return (len(text) + 3) // 4
+    return len(_encoding.encode(text))
+
+
+def build_context(events, token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Construit un contexte compact à partir d'événements d'emploi du temps.
+
+    Les doublons sont retirés et les cours sont regroupés par jour, une ligne par
+    cours (`HH:MM-HH:MM | cours | professeur`). Les jours sont ajoutés dans l'ordre
+    chronologique tant que le budget de tokens le permet ; les cours qui ne
+    rentrent pas sont signalés en fin de contexte.
+
+    Args:
+        events (list[dict]): Des événements avec les clés "nom_cours", "début",
+            "fin" ('YYYY-MM-DD HH:MM') et, éventuellement, "professeur".
+        token_budget (int): Le nombre maximum de tokens du contexte.
+
+    Returns:
+        str: Le contexte.
+    """
+    unique = {
+        (event.get("début", ""), event.get("fin", ""), event.get("nom_cours", ""), event.get("professeur", ""))
+        for event in events
+    }
+    par_jour = defaultdict(list)
+    for debut, fin, nom_cours, professeur in sorted(unique):
+        par_jour[debut[:10]].append(
+            f"{debut[11:16]}-{fin[11:16]} | {nom_cours}" + (f" | {professeur}" if professeur else "")
+        )
+
+    blocks, used_tokens, omitted = [], 0, 0
+    for jour, lignes in sorted(par_jour.items()):
+        try:
+            titre = f"{jour} ({JOURS[date.fromisoformat(jour).weekday()]})"
+        except ValueError:
+            titre = jour
+        block = "\n".join([titre, *lignes])
+        block_tokens = count_tokens(block) + 1
+        if omitted or used_tokens + block_tokens > token_budget:
+            omitted += len(lignes)
+            continue
+        blocks.append(block)
+        used_tokens += block_tokens
+
+    if omitted:
+        logging.info(f"Budget de {token_budget} tokens atteint : {omitted} cours non inclus dans le contexte")
+        blocks.append(f"({omitted} cours suivants non inclus)")
+    return "\n\n".join(blocks)
@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from faiss_index import FAISS_PQ_RERANK, exact_top_k, index_kind, search_parameters
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.sqlite"
+INDEX_INFO_FILE = "index.json"  # Configuration de l'index (type, paramètres, taille d'entraînement)
+TRAINED_INDEX_FILE = "trained.faiss"  # Index vide entraîné, réutilisé par les générations suivantes
+VECTORS_FILE = "vectors.npy"  # Vecteurs exacts, conservés quand l'index les compresse (IVF-PQ)
+# Au-delà, une recherche filtrée sur un index approché passe par l'index lui-même plutôt
+# que par une comparaison directe avec chaque candidat
+EXACT_SEARCH_MAX_CANDIDATES = int(os.getenv("EXACT_SEARCH_MAX_CANDIDATES", "4096"))
+# Lecture sans copie des index à codes plats (IndexFlat...), sinon mmap classique
+MMAP_FLAGS = [flag for flag in (getattr(faiss, "IO_FLAG_MMAP_IFC", None), faiss.IO_FLAG_MMAP) if flag is not None]
+
+
+def read_index(path):
+    """
+    Ouvre un index FAISS en mémoire partagée (mmap) si son type le permet.
+
+    Les pages de l'index sont alors partagées par tous les processus via le cache
+    du système, au lieu d'être copiées dans la mémoire de chaque worker.
+
+    Args:
+        path (str): Le fichier de l'index.
+
+    Returns:
+        faiss.Index: L'index, en lecture seule s'il est mappé.
+    """
+    for flag in MMAP_FLAGS:
+        try:
+            return faiss.read_index(path, flag)
+        except RuntimeError:
+            continue
+    logging.info(f"Index {path} chargé en mémoire (mmap non supporté pour ce type d'index)")
+    return faiss.read_index(path)
+
+
+def write_store(path, index, documents, info=None, trained=None, vectors=None):
+    """
+    Écrit un vector store sur disque : l'index FAISS et les documents dans SQLite.
+
+    Le document i correspond au vecteur de position i de l'index.
+
+    Args:
+        path (str): Le dossier à créer.
+        index (faiss.Index): L'index, contenant un vecteur par document.
+        documents (list[Document]): Les documents, dans l'ordre des vecteurs.
+        info (dict, optional): Les informations de l'index (voir `faiss_index.build_index`).
+        trained (faiss.Index, optional): L'index vide entraîné à conserver.
+        vectors (np.ndarray, optional): Les vecteurs exacts, à conserver si l'index
+            ne permet pas de les retrouver sans perte.
+    """
+    if index.ntotal != len(documents):
+        raise ValueError(f"{index.ntotal} vecteurs pour {len(documents)} documents")
+    os.makedirs(path, exist_ok=True)
+    faiss.write_index(index, os.path.join(path, INDEX_FILE))
+    if trained is not None:
+        faiss.write_index(trained, os.path.join(path, TRAINED_INDEX_FILE))
+    if vectors is not None:
+        np.save(os.path.join(path, VECTORS_FILE), np.ascontiguousarray(vectors, dtype="float32"))
+    if info is not None:
+        with open(os.path.join(path, INDEX_INFO_FILE), "w", encoding="utf-8") as file:
+            json.dump(info, file)
+    conn = sqlite3.connect(os.path.join(path, DOCSTORE_FILE))
+    try:
+        conn.execute(
+            "CREATE TABLE documents ("
+            "position INTEGER PRIMARY KEY, doc_id TEXT NOT NULL, date TEXT, content_hash TEXT, "
+            "page_content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        conn.executemany(
+            "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    position,
+                    doc.metadata.get("doc_id"),
+                    doc.metadata.get("date"),
+                    doc.metadata.get("content_hash"),
+                    doc.page_content,
+                    json.dumps(doc.metadata, ensure_ascii=False),
+                )
+                for position, doc in enumerate(documents)
+            ),
+        )
+        conn.execute("CREATE INDEX documents_date ON documents(date)")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class DiskVectorStore:
+    """Vector store en lecture seule, ouvert depuis un dossier écrit par `write_store`.
+
+    L'index FAISS est mappé en mémoire et les documents restent dans SQLite : seuls
+    ceux des résultats d'une recherche sont lus. La mémoire occupée et le temps
+    d'ouverture ne dépendent donc pas du nombre de documents. Le dossier ne doit pas
+    être modifié après l'ouverture.
+    """
+
+    def __init__(self, path, embedding_function):
+        self.path = path
+        self.embedding_function = embedding_function
+        self.index = read_index(os.path.join(path, INDEX_FILE))
+        self.kind = index_kind(self.index)
+        try:
+            with open(os.path.join(path, INDEX_INFO_FILE), "r", encoding="utf-8") as file:
+                self.info = json.load(file)
+        except FileNotFoundError:
+            self.info = {"config": {"type": "flat"}}
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        self._vectors = np.load(vectors_path, mmap_mode="r") if os.path.exists(vectors_path) else None
+        # Une seule connexion, ouverte tout de suite : elle reste valable même si le
+        # dossier est supprimé ensuite par le ramasse-miettes des générations
+        self._conn = sqlite3.connect(
+            f"file:{os.path.abspath(os.path.join(path, DOCSTORE_FILE))}?mode=ro&immutable=1",
+            uri=True, check_same_thread=False,
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def positions(self, filter_criteria):
+        """
+        Retourne les positions des documents dont les métadonnées correspondent au filtre.
+
+        Args:
+            filter_criteria (dict): Pour chaque clé de métadonnée, une valeur ou une liste
+                de valeurs acceptées (ex: {"date": ["2024-03-04", "2024-03-05"]}).
+
+        Returns:
+            np.ndarray: Les positions (int64), triées.
+        """
+        clauses, params = [], []
+        for key, values in filter_criteria.items():
+            values = [values] if isinstance(values, str) or not isinstance(values, (list, tuple, set)) else list(values)
+            if not values:
+                return np.empty(0, dtype="int64")
+            column = "date" if key == "date" else "json_extract(metadata, ?)"
+            if key != "date":
+                params.append('$."' + str(key).replace('"', '""') + '"')
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        sql = "SELECT position FROM documents" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+        return np.asarray(sorted(row[0] for row in self._query(sql, params)), dtype="int64")
+
+    def documents(self, positions):
+        """Lit les documents des positions données, dans le même ordre."""
+        positions = [int(position) for position in positions]
+        if not positions:
+            return []
+        rows = {}
+        for start in range(0, len(positions), 500):
+            chunk = positions[start:start + 500]
+            rows.update(
+                (position, Document(page_content=page_content, metadata=json.loads(metadata)))
+                for position, page_content, metadata in self._query(
+                    f"SELECT position, page_content, metadata FROM documents WHERE position IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+        return [rows[position] for position in positions if position in rows]
+
+    def content_hashes(self):
+        """Retourne {doc_id: (position, content_hash)} pour tous les documents."""
+        return {
+            doc_id: (position, stored_hash)
+            for position, doc_id, stored_hash in self._query("SELECT position, doc_id, content_hash FROM documents")
+        }
+
+    def vectors(self, positions):
+        """Retourne les vecteurs exacts des positions données (float32, une ligne par position)."""
+        positions = np.ascontiguousarray(positions, dtype="int64")
+        if self._vectors is not None:
+            return np.asarray(self._vectors[positions])
+        return self.index.reconstruct_batch(positions)
+
+    def trained_index(self):
+        """Retourne (index vide entraîné, informations) s'il a été conservé, sinon None."""
+        path = os.path.join(self.path, TRAINED_INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        return faiss.read_index(path), self.info
+
+    def search(self, querry_text, k, positions=None):
+        """
+        Recherche les `k` documents les plus proches de la requête.
+
+        Args:
+            querry_text (str): La requête.
+            k (int): Le nombre de documents voulus.
+            positions (np.ndarray, optional): Les seules positions candidates
+                (transmises à FAISS sous forme d'IDSelector).
+
+        Returns:
+            list[Document]: Les documents, du plus proche au plus éloigné.
+        """
+        candidates = self.index.ntotal if positions is None else len(positions)
+        if candidates == 0 or k <= 0:
+            return []
+        query_vector = np.asarray([self.embedding_function.embed_query(querry_text)], dtype="float32")
+        selector = None
+        if positions is not None:
+            positions = np.ascontiguousarray(positions, dtype="int64")
+            if self.kind != "flat" and len(positions) <= EXACT_SEARCH_MAX_CANDIDATES:
+                # Peu de candidats : un parcours approché filtré en manquerait, on les compare directement
+                return self.documents(exact_top_k(query_vector, positions, self.vectors(positions), k))
+            selector = faiss.IDSelectorBatch(len(positions), faiss.swig_ptr(positions))
+        params = search_parameters(self.index, selector)
+        # Distances approchées (IVF-PQ) : on lit plus de candidats puis on les reclasse exactement
+        rerank = self._vectors is not None
+        _, found_positions = self.index.search(
+            query_vector, min(k * FAISS_PQ_RERANK if rerank else k, candidates), params=params
+        )
+        found_positions = found_positions[0][found_positions[0] != -1]
+        if rerank:
+            found_positions = exact_top_k(query_vector, found_positions, self.vectors(found_positions), k)
+        return self.documents(found_positions)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,154 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """Cache persistant placé devant un modèle d'embeddings.
+
+    Les vecteurs sont stockés dans une base SQLite locale (float32 brut, 4 octets
+    par dimension), indexés par un hash de (modèle, dimensions, texte). Les textes
+    absents du cache sont envoyés au modèle par lots, avec un nombre borné de
+    requêtes simultanées. Au-delà de `max_entries`, les vecteurs les moins
+    récemment utilisés sont supprimés.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, path: str,
+                 dimensions=None, max_entries=200_000, batch_size=256, max_concurrency=4):
+        """
+        Args:
+            underlying (Embeddings): Le modèle d'embeddings réel (ex: OpenAIEmbeddings).
+            model_name (str): Le nom du modèle, utilisé dans la clé du cache.
+            path (str): Le chemin du fichier SQLite du cache.
+            dimensions (int, optional): Les dimensions demandées au modèle, utilisées dans la clé.
+            max_entries (int): Le nombre maximum de vecteurs conservés.
+            batch_size (int): Le nombre de textes envoyés par requête au modèle.
+            max_concurrency (int): Le nombre maximum de requêtes simultanées.
+        """
+        self.underlying = underlying
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings(last_access)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS dimensions (model_key TEXT PRIMARY KEY, dim INTEGER NOT NULL)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _model_key(self):
+        return f"{self.model_name}|{self.dimensions}"
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self._model_key()}|{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys):
+        found = {}
+        now = time.time()
+        with self._lock:
+            # SQLite limite le nombre de paramètres par requête
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype="float32").tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_access = ? WHERE key IN ({placeholders})", [now, *chunk]
+                    )
+            self._conn.commit()
+        return found
+
+    def _store(self, vectors_by_key):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [
+                    (key, np.asarray(vector, dtype="float32").tobytes(), now)
+                    for key, vector in vectors_by_key.items()
+                ],
+            )
+            self._count += len(vectors_by_key)
+            if self._count > self.max_entries:
+                self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                excess = self._count - self.max_entries
+                if excess > 0:
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                        (excess,),
+                    )
+                    self._count -= excess
+                    logging.info(f"Cache d'embeddings : {excess} vecteur(s) évincé(s)")
+            self._conn.commit()
+
+    def _embed_missing(self, texts):
+        """Embedde les textes manquants par lots, avec une concurrence bornée."""
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self.underlying.embed_documents(batches[0])
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            results = executor.map(self.underlying.embed_documents, batches)
+            return [vector for batch in results for vector in batch]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        # Un même texte manquant n'est envoyé qu'une seule fois au modèle
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self._embed_missing(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+        logging.info(f"Cache d'embeddings : {len(texts) - len(missing)}/{len(texts)} texte(s) trouvé(s)")
+        return [list(found[key]) for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    def dimension(self) -> int:
+        """
+        Retourne la dimension des vecteurs du modèle, sans appel au modèle si elle est déjà connue.
+
+        Returns:
+            int: La dimension des vecteurs.
+        """
+        if self.dimensions:
+            return self.dimensions
+        model_key = self._model_key()
+        with self._lock:
+            row = self._conn.execute("SELECT dim FROM dimensions WHERE model_key = ?", (model_key,)).fetchone()
+        if row:
+            return row[0]
+        dim = len(self.embed_query("hello world"))
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO dimensions (model_key, dim) VALUES (?, ?)", (model_key, dim))
+            self._conn.commit()
+        return dim
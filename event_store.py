@@ -0,0 +1,286 @@
+from datetime import date, datetime, timedelta
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pytz
+
+LOCAL_TZ = pytz.timezone("Pacific/Noumea")
+DATE_FORMAT = '%Y-%m-%d %H:%M'
+
+
+class _Interner:
+    """Associe chaque chaîne distincte à un entier."""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self._ids = {value: index for index, value in enumerate(self.values)}
+
+    def __call__(self, value):
+        index = self._ids.get(value)
+        if index is None:
+            index = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+
+class EventStore:
+    """Emploi du temps d'un utilisateur stocké en colonnes.
+
+    Les événements sont triés par date de début. Chaque colonne est un tableau numpy :
+    début et fin en secondes epoch (UTC), identifiants de cours, de professeur et de
+    description (les chaînes sont internées dans `courses`, `professors` et
+    `descriptions`) et semaine ISO (année * 100 + semaine). Les recherches par
+    fenêtre de dates se font par recherche dichotomique sur les débuts.
+    """
+
+    def __init__(self, starts, ends, course_ids, professor_ids, description_ids, weeks,
+                 courses, professors, descriptions):
+        self.starts = np.asarray(starts, dtype="int64")
+        self.ends = np.asarray(ends, dtype="int64")
+        self.course_ids = np.asarray(course_ids, dtype="int32")
+        self.professor_ids = np.asarray(professor_ids, dtype="int32")
+        self.description_ids = np.asarray(description_ids, dtype="int32")
+        self.weeks = np.asarray(weeks, dtype="int32")
+        self.courses = list(courses)
+        self.professors = list(professors)
+        self.descriptions = list(descriptions)
+        # Durée maximale d'un événement : borne la recherche des événements qui chevauchent une fenêtre
+        self._max_duration = int((self.ends - self.starts).max()) if len(self.starts) else 0
+        self._version = None
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def version(self):
+        """Empreinte du contenu du store : change dès qu'un événement est ajouté, modifié ou supprimé."""
+        if self._version is None:
+            digest = hashlib.sha1()
+            for column in (self.starts, self.ends, self.course_ids, self.professor_ids, self.description_ids):
+                digest.update(column.tobytes())
+            for values in (self.courses, self.professors, self.descriptions):
+                digest.update("\x1f".join(values).encode("utf-8"))
+            self._version = digest.hexdigest()
+        return self._version
+
+    @classmethod
+    def from_events(cls, events):
+        """
+        Construit le store à partir des événements de `scrap_edt.get_events`.
+
+        Args:
+            events (List[Dict]): Des événements avec les clés "begin", "end" (datetime
+                avec fuseau), "name" et "description".
+
+        Returns:
+            EventStore: Le store trié par date de début.
+        """
+        records = []
+        for event in events:
+            description_lignes = event["description"].split("\n")
+            professeur = description_lignes[1].strip() if len(description_lignes) > 1 else 'Inconnu'
+            iso_year, iso_week, _ = event["begin"].isocalendar()
+            records.append((
+                int(event["begin"].timestamp()),
+                int(event["end"].timestamp()),
+                event["name"].split('(')[0].strip(),
+                professeur,
+                event["description"].split('(')[0].strip(),
+                iso_year * 100 + iso_week,
+            ))
+        # Tri avant l'internement : les identifiants, donc la version, ne dépendent pas de l'ordre reçu
+        records.sort()
+        courses, professors, descriptions = _Interner(), _Interner(), _Interner()
+        rows = [
+            (start, end, courses(course), professors(professeur), descriptions(description), week)
+            for start, end, course, professeur, description, week in records
+        ]
+        columns = list(zip(*rows)) if rows else [()] * 6
+        return cls(*columns, courses.values, professors.values, descriptions.values)
+
+    def overlapping(self, start, end):
+        """
+        Retourne les positions des événements qui chevauchent [start, end[.
+
+        Args:
+            start (int): Début de la fenêtre, en secondes epoch.
+            end (int): Fin de la fenêtre (exclue), en secondes epoch.
+
+        Returns:
+            np.ndarray: Les positions, dans l'ordre des dates de début.
+        """
+        lo = np.searchsorted(self.starts, start - self._max_duration, side="left")
+        hi = np.searchsorted(self.starts, end, side="left")
+        candidates = np.arange(lo, hi)
+        return candidates[self.ends[lo:hi] > start]
+
+    def starting_between(self, start, end):
+        """Retourne les positions des événements qui commencent dans [start, end[."""
+        lo = np.searchsorted(self.starts, start, side="left")
+        hi = np.searchsorted(self.starts, end, side="left")
+        return np.arange(lo, hi)
+
+    def on_dates(self, dates):
+        """
+        Retourne les positions des événements qui commencent à l'une des dates données.
+
+        Args:
+            dates (list[str | date]): Des dates ISO ('YYYY-MM-DD') ou des objets date.
+
+        Returns:
+            np.ndarray: Les positions, dans l'ordre des dates de début.
+        """
+        positions = [self.starting_between(*day_bounds(day)) for day in sorted(set(dates), key=str)]
+        if not positions:
+            return np.empty(0, dtype="int64")
+        return np.unique(np.concatenate(positions))
+
+    def week(self, iso_year, iso_week):
+        """Retourne les positions des événements de la semaine ISO donnée."""
+        return np.flatnonzero(self.weeks == iso_year * 100 + iso_week)
+
+    def records(self, positions=None):
+        """
+        Reconstruit les événements au format des JSON de `json_schedules`.
+
+        Args:
+            positions (np.ndarray, optional): Les positions à reconstruire, toutes par défaut.
+
+        Returns:
+            List[Dict[str, str]]: Des dictionnaires avec les clés "nom_cours", "début",
+            "fin", "professeur" et "description".
+        """
+        if positions is None:
+            positions = range(len(self))
+        return [
+            {
+                "nom_cours": self.courses[self.course_ids[position]],
+                "début": datetime.fromtimestamp(int(self.starts[position]), LOCAL_TZ).strftime(DATE_FORMAT),
+                "fin": datetime.fromtimestamp(int(self.ends[position]), LOCAL_TZ).strftime(DATE_FORMAT),
+                "professeur": self.professors[self.professor_ids[position]],
+                "description": self.descriptions[self.description_ids[position]],
+            }
+            for position in positions
+        ]
+
+    def save(self, path):
+        """Sauvegarde le store dans un fichier binaire compressé (.npz), remplacé de façon atomique."""
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez_compressed(
+                file,
+                starts=self.starts, ends=self.ends,
+                course_ids=self.course_ids, professor_ids=self.professor_ids,
+                description_ids=self.description_ids, weeks=self.weeks,
+                courses=np.array(self.courses, dtype=str),
+                professors=np.array(self.professors, dtype=str),
+                descriptions=np.array(self.descriptions, dtype=str),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Charge un store sauvegardé par `save`."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["starts"], data["ends"],
+                data["course_ids"], data["professor_ids"], data["description_ids"], data["weeks"],
+                data["courses"].tolist(), data["professors"].tolist(), data["descriptions"].tolist(),
+            )
+
+
+def day_bounds(day):
+    """
+    Retourne les bornes epoch [début, fin[ d'une journée dans le fuseau de Nouméa.
+
+    Args:
+        day (str | date): Une date ISO ('YYYY-MM-DD') ou un objet date.
+
+    Returns:
+        tuple[int, int]: Le début de la journée et le début du lendemain.
+    """
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    start = LOCAL_TZ.localize(datetime(day.year, day.month, day.day))
+    next_day = day + timedelta(days=1)
+    end = LOCAL_TZ.localize(datetime(next_day.year, next_day.month, next_day.day))
+    return int(start.timestamp()), int(end.timestamp())
+
+
+# Tests
+class TestEventStore:
+    """Vérifie les recherches par fenêtre, la sauvegarde et l'empreinte de l'EventStore."""
+
+    @staticmethod
+    def _event(day, start_hour, hours, name="Algorithmique (TD)"):
+        begin = LOCAL_TZ.localize(datetime(2024, 3, day) + timedelta(hours=start_hour))
+        return {
+            "begin": begin,
+            "end": begin + timedelta(hours=hours),
+            "name": name,
+            "description": "Algorithmique (L2)\nJean Dupont\nSalle B204",
+        }
+
+    def _store(self):
+        return EventStore.from_events([
+            self._event(5, 10, 2, "Réseaux (CM)"),
+            self._event(4, 8, 2),
+            self._event(4, 13, 50),  # Stage de plus de deux jours
+            self._event(6, 8, 1),
+        ])
+
+    def test_sorted_and_interned(self):
+        """Les événements sont triés par début et les chaînes répétées ne sont stockées qu'une fois."""
+        store = self._store()
+        assert list(store.starts) == sorted(store.starts)
+        assert store.courses == ["Algorithmique", "Réseaux"]  # Internées dans l'ordre des dates
+        assert store.records([0])[0]["début"] == "2024-03-04 08:00"
+
+    def test_on_dates(self):
+        """Seuls les événements qui commencent aux dates données sont retenus."""
+        store = self._store()
+        assert [record["début"] for record in store.records(store.on_dates(["2024-03-05", "2024-03-04"]))] == [
+            "2024-03-04 08:00", "2024-03-04 13:00", "2024-03-05 10:00",
+        ]
+        assert len(store.on_dates([])) == 0
+        assert len(store.on_dates(["2024-03-07"])) == 0
+
+    def test_overlapping_long_event(self):
+        """Un événement plus long que la fenêtre, commencé avant elle, est retrouvé grâce à _max_duration."""
+        store = self._store()
+        assert store._max_duration == 50 * 3600
+        start, end = day_bounds("2024-03-06")
+        assert [record["début"] for record in store.records(store.overlapping(start, end))] == [
+            "2024-03-04 13:00", "2024-03-06 08:00",
+        ]
+        # Fenêtre [fin d'un cours, ...[ : un cours qui se termine au début de la fenêtre n'en fait pas partie
+        first_end = int(store.ends[0])
+        assert 0 not in store.overlapping(first_end, first_end + 60)
+
+    def test_save_load_round_trip(self, tmp_path):
+        """Un store rechargé est identique, y compris un store vide."""
+        for store in (self._store(), EventStore.from_events([])):
+            path = str(tmp_path / "edt.npz")
+            store.save(path)
+            loaded = EventStore.load(path)
+            assert loaded.records() == store.records()
+            assert loaded.version == store.version
+            assert len(loaded) == len(store)
+            assert len(loaded.overlapping(0, 2**40)) == len(store)
+
+    def test_version(self):
+        """L'empreinte ne dépend que du contenu, pas de l'ordre des événements reçus."""
+        events = [self._event(4, 8, 2), self._event(5, 10, 2)]
+        version = EventStore.from_events(events).version
+        assert EventStore.from_events(list(reversed(events))).version == version
+        assert EventStore.from_events(events[:1]).version != version
+        assert EventStore.from_events([self._event(4, 8, 3), events[1]]).version != version
+
+    def test_version_distinct_names(self):
+        """Des cours différents, même au même créneau, sont internés dans le même ordre quel que soit l'ordre reçu."""
+        events = [self._event(4, 8, 2, "Réseaux (CM)"), self._event(4, 8, 2), self._event(5, 10, 2, "Bases de données (TP)")]
+        version = EventStore.from_events(events).version
+        assert EventStore.from_events(list(reversed(events))).version == version
+        assert EventStore.from_events(events[1:] + events[:1]).version == version
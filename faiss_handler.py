@@ -1,19 +1,37 @@
-from datetime import datetime
+import hashlib
 from dotenv import load_dotenv
-import faiss
-from langchain_community.docstore.in_memory import InMemoryDocstore
-from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
+import numpy as np
 from langchain_core.documents import Document
 from langchain_community.document_loaders import JSONLoader
+from disk_vector_store import DiskVectorStore, write_store
+from faiss_index import build_index
+from embedding_cache import CachedEmbeddings
+from local_embeddings import HashingEmbeddings
 import logging
 import os
+import re
+import shutil
+import sqlite3
+import threading
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows : les écritures ne sont alors sérialisées qu'au sein du processus
+    fcntl = None
 
 
 ###################PATH VARIABLES###################
 DATA_PATH = "data/"
 FAISS_PATH = "faiss_data"
 JSON_PATH ="json_schedules"
+CURRENT_FILE = "CURRENT"  # Nom de la génération publiée de l'index d'un utilisateur
+LOCK_FILE = ".lock"  # Verrou des écrivains, partagé entre processus
+KEEP_GENERATIONS = 2  # Anciennes générations conservées pour les lectures en cours
+# Index gardés ouverts par processus (chacun garde un fichier SQLite et un mmap ouverts)
+STORE_CACHE_MAX_ENTRIES = int(os.getenv("STORE_CACHE_MAX_ENTRIES", "64"))
+EMBEDDING_CACHE_PATH = "embedding_cache/embeddings.sqlite"
 ##################SETUP DES LOGS###################
 # Ensure the logs directory exists
 log_dir = "logs"
@@ -40,20 +58,109 @@ try:
 except Exception as e:
     logging.error(f"Erreur dans le chargement des variables d'environnement: {repr(e)}")
 
-# Configuration de l'API Key
-try:
-    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_KEY")
-    if not os.environ["OPENAI_API_KEY"]:
-        raise ValueError("OPENAI_API_KEY non défini dans les variables d'environnement.")
-except Exception as e:
-    logging.error(f"Erreur lors de la définition de la clé API OpenAI: {repr(e)}")
+##################EMBEDDINGS###################
+# "openai" (par défaut) ou "hashing" : embedder local déterministe, sans réseau
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "384"))  # Utilisée par le backend "hashing"
+EMBEDDING_MODEL = "text-embedding-3-large"
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+# Les index d'un backend ne sont pas compatibles avec ceux d'un autre, ni avec ceux
+# d'une autre dimension : chaque combinaison a son dossier (ex: faiss_data_hashing_384)
+if EMBEDDING_BACKEND != "openai":
+    FAISS_PATH = f"{FAISS_PATH}_{EMBEDDING_BACKEND}_{EMBEDDING_DIMENSION}"
+##############################################
 
-# Initialisation des embeddings
-try:
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-    logging.info("Modèle initialisé")
-except Exception as e:
-    logging.error(f"Erreur dans l'initialisation du modèle: {repr(e)}")
+def create_embeddings(backend=EMBEDDING_BACKEND):
+    """
+    Crée le modèle d'embeddings correspondant au backend demandé.
+
+    Args:
+        backend (str): "openai" pour OpenAI derrière le cache disque, "hashing" pour
+            l'embedder local déterministe de dimension EMBEDDING_DIMENSION.
+
+    Raises:
+        ValueError: Si le backend est inconnu.
+
+    Returns:
+        Embeddings: Le modèle d'embeddings.
+    """
+    if backend == "hashing":
+        return HashingEmbeddings(dimension=EMBEDDING_DIMENSION)
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings  # Import coûteux, fait au premier usage
+        # Configuration de l'API Key
+        try:
+            os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_KEY")
+            if not os.environ["OPENAI_API_KEY"]:
+                raise ValueError("OPENAI_API_KEY non défini dans les variables d'environnement.")
+        except Exception as e:
+            logging.error(f"Erreur lors de la définition de la clé API OpenAI: {repr(e)}")
+        return CachedEmbeddings(
+            OpenAIEmbeddings(model=EMBEDDING_MODEL, chunk_size=EMBEDDING_BATCH_SIZE),
+            model_name=EMBEDDING_MODEL,
+            path=EMBEDDING_CACHE_PATH,
+            max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            max_concurrency=EMBEDDING_MAX_CONCURRENCY,
+        )
+    raise ValueError(f"Backend d'embeddings inconnu : {backend}")
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings():
+    """
+    Retourne le modèle d'embeddings partagé par tout le processus.
+
+    Le modèle est créé au premier appel (et non à l'import du module) puis réutilisé.
+
+    Raises:
+        Exception: Si le modèle ne peut pas être initialisé.
+
+    Returns:
+        Embeddings: Le modèle d'embeddings.
+    """
+    global _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            try:
+                _embeddings = create_embeddings()
+                logging.info(f"Modèle initialisé (backend {EMBEDDING_BACKEND})")
+            except Exception as e:
+                logging.error(f"Erreur dans l'initialisation du modèle: {repr(e)}")
+                raise
+        return _embeddings
+
+def event_document_id(user_id, record: dict) -> str:
+    """
+    Calcule l'identifiant stable du document d'un événement.
+
+    L'identifiant ne dépend que de (user_id, cours, début, fin, professeur) : un même
+    événement garde donc le même identifiant d'une synchronisation à l'autre.
+
+    Args:
+        user_id (str): L'identifiant de l'utilisateur.
+        record (dict): L'événement tel qu'écrit dans le JSON de l'emploi du temps.
+
+    Returns:
+        str: Un hash SHA-1 hexadécimal.
+    """
+    key = "\x1f".join(
+        str(value) for value in (
+            user_id,
+            record.get('nom_cours'),
+            record.get('début'),
+            record.get('fin'),
+            record.get('professeur'),
+        )
+    )
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
 
 # Permet à la fonction metadata_func d'avoir acces à la variable user_id
 def create_metadata_func(user_id):
@@ -62,9 +169,9 @@ def create_metadata_func(user_id):
         # Extract the start date from the record
         start_date_str = record.get('début')
         if start_date_str:
-            start_date = datetime.strptime(start_date_str, "%Y-%m-%d %H:%M")
-            metadata['date'] = start_date.date().isoformat()  # Store the date in ISO format
+            metadata['date'] = start_date_str[:10]  # 'YYYY-MM-DD HH:MM' commence déjà par la date ISO
         metadata['user_id'] = user_id
+        metadata['doc_id'] = event_document_id(user_id, record)
         metadata['source'] = f"http://applis.univ-nc.nc/cgi-bin/WebObjects/EdtWeb.woa/2/wa/default?login={user_id}%2Fical"
         return metadata
     return metadata_func
@@ -83,71 +190,395 @@ def json_to_documents(user_id):
 
     return documents
 
-def load_faiss_vector_store():
+# Cache process-wide des vector stores : un index FAISS par utilisateur, partagé par
+# toutes les sessions Streamlit du même processus et rouvert seulement si une
+# nouvelle génération est publiée sur disque. L'index est mappé en mémoire et les
+# documents restent dans SQLite (voir disk_vector_store).
+#
+# Chaque index est publié par copie sur écriture : faiss_data/<utilisateur>/ contient
+# des générations immuables (gen-000001/, gen-000002/, ...) et le fichier CURRENT qui
+# désigne la génération publiée. Un écrivain écrit une nouvelle génération à côté,
+# puis remplace CURRENT de façon atomique (os.replace) : un lecteur voit soit
+# l'ancienne génération, soit la nouvelle, jamais un index à moitié écrit, et ne
+# prend aucun verrou d'écriture. Les écrivains d'un même utilisateur sont sérialisés
+# par un verrou de thread et un verrou de fichier (entre processus).
+#
+# Le cache est un LRU de STORE_CACHE_MAX_ENTRIES index : les stores évincés sont
+# fermés, pour ne pas épuiser les descripteurs de fichiers quand beaucoup
+# d'utilisateurs passent par le même processus. Seuls les lecteurs le remplissent.
+_store_lock = threading.Lock()
+_user_locks = {}  # user_id -> verrou des écrivains du processus
+_load_locks = {}  # user_id -> verrou évitant de charger deux fois la même génération
+_store_cache = OrderedDict()  # user_id -> {"vector_store": DiskVectorStore, "version": str}, du moins au plus récemment utilisé
+
+def _user_lock(user_id):
+    with _store_lock:
+        return _user_locks.setdefault(user_id, threading.RLock())
+
+def _load_lock(user_id):
+    with _store_lock:
+        return _load_locks.setdefault(user_id, threading.Lock())
+
+def user_faiss_path(user_id):
+    """
+    Retourne le dossier de l'index FAISS propre à un utilisateur.
+
+    Args:
+        user_id (str): L'identifiant de l'utilisateur.
+
+    Returns:
+        str: Le chemin du sous-index de l'utilisateur dans FAISS_PATH.
+    """
+    # On neutralise les caractères qui permettraient de sortir de FAISS_PATH
+    return os.path.join(FAISS_PATH, re.sub(r"[^A-Za-z0-9._-]", "_", str(user_id)))
+
+@contextmanager
+def _writer_lock(user_id):
+    """Sérialise les écrivains de l'index d'un utilisateur, dans le processus et entre processus."""
+    store_path = user_faiss_path(user_id)
+    os.makedirs(store_path, exist_ok=True)
+    with _user_lock(user_id):
+        with open(os.path.join(store_path, LOCK_FILE), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def _current_generation(store_path):
     """
-    Charge le vector store FAISS à partir du chemin spécifié.
-    
+    Retourne la génération publiée de l'index.
+
+    Args:
+        store_path (str): Le dossier de l'index de l'utilisateur.
+
     Returns:
-        FAISS: L'instance du vector store FAISS chargée.
+        str | None: Le nom du dossier de la génération (ex: "gen-000003"), ou None si aucun index n'est publié.
     """
-    if os.path.exists(FAISS_PATH):
+    try:
+        with open(os.path.join(store_path, CURRENT_FILE), "r", encoding="utf-8") as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def _cached_entry(user_id, version):
+    """Retourne l'entrée du cache si elle correspond à la génération `version`, sinon None."""
+    with _store_lock:
+        entry = _store_cache.get(user_id)
+        if entry is None or entry["version"] != version:
+            return None
+        _store_cache.move_to_end(user_id)
+        return entry
+
+def _cache_entry(user_id, vector_store, version):
+    entry = {"vector_store": vector_store, "version": version}
+    with _store_lock:
+        evicted = [_store_cache.pop(user_id, None)]
+        _store_cache[user_id] = entry
+        while len(_store_cache) > STORE_CACHE_MAX_ENTRIES:
+            evicted.append(_store_cache.popitem(last=False)[1])
+    for old in evicted:
+        if old is not None:
+            old["vector_store"].close()
+    return entry
+
+def _uncache(user_id):
+    with _store_lock:
+        entry = _store_cache.pop(user_id, None)
+    if entry is not None:
+        entry["vector_store"].close()
+
+def _open_published(store_path):
+    """Ouvre la génération publiée hors du cache (pour un écrivain), ou retourne None s'il n'y en a pas."""
+    for _ in range(2):
+        version = _current_generation(store_path)
+        if version is None:
+            return None
+        try:
+            return DiskVectorStore(os.path.join(store_path, version), get_embeddings())
+        except Exception:
+            # Génération supprimée entre-temps (par le nettoyage d'un autre écrivain) : on relit CURRENT
+            if _current_generation(store_path) == version:
+                raise
+    return None
+
+def _collect_generations(store_path, current):
+    """Supprime les générations qui ne sont plus publiées, sauf les KEEP_GENERATIONS plus récentes."""
+    generations = sorted(name for name in os.listdir(store_path) if re.fullmatch(r"gen-\d{6}", name))
+    if current in generations:
+        generations = generations[max(0, generations.index(current) - KEEP_GENERATIONS):]
+    keep = set(generations) | {current, CURRENT_FILE, LOCK_FILE}
+    for name in os.listdir(store_path):
+        if name in keep:
+            continue
+        path = os.path.join(store_path, name)
         try:
-            vector_store = FAISS.load_local(FAISS_PATH, embeddings, allow_dangerous_deserialization=True)
-            logging.info(f"Index FAISS local chargé depuis : {FAISS_PATH}")
-            return vector_store
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            logging.info(f"{path} supprimé (ancienne génération)")
         except Exception as e:
-            logging.error(f"Erreur lors du chargement de l'index FAISS : {repr(e)}")
+            logging.error(f"Erreur lors de la suppression de {path}: {repr(e)}")
+
+def _publish_generation(user_id, index, documents, info=None, trained=None, vectors=None):
+    """
+    Publie un index et ses documents comme nouvelle génération de l'index d'un utilisateur.
+
+    Doit être appelée sous `_writer_lock(user_id)`. La génération est écrite dans un
+    dossier temporaire, renommée, puis rendue visible en remplaçant CURRENT.
+    `info`, `trained` et `vectors` sont transmis à `write_store`.
+
+    Returns:
+        str: Le nom de la génération publiée.
+    """
+    store_path = user_faiss_path(user_id)
+    current = _current_generation(store_path)
+    name = f"gen-{(int(current.split('-')[1]) if current else 0) + 1:06d}"
+    generation_path = os.path.join(store_path, name)
+    tmp_path = os.path.join(store_path, f".{name}.tmp")
+    # Restes éventuels d'un écrivain interrompu : ces dossiers n'ont jamais été publiés
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    shutil.rmtree(generation_path, ignore_errors=True)
+    write_store(tmp_path, index, documents, info, trained, vectors)
+    os.replace(tmp_path, generation_path)
+
+    pointer_tmp = os.path.join(store_path, f"{CURRENT_FILE}.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as file:
+        file.write(name)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(pointer_tmp, os.path.join(store_path, CURRENT_FILE))
+    _collect_generations(store_path, name)
+    return name
+
+def _load_user_entry(user_id):
+    store_path = user_faiss_path(user_id)
+    # Deux essais : la génération lue a pu être supprimée par un écrivain entre-temps
+    for _ in range(2):
+        version = _current_generation(store_path)
+        if version is None:
+            _uncache(user_id)
+            logging.info(f"Aucun index FAISS trouvé à {store_path}")
             return None
-    else:
-        logging.info(f"Aucun index FAISS trouvé à {FAISS_PATH}")
-        return None
+        cached = _cached_entry(user_id, version)
+        if cached is not None:
+            return cached
+        with _load_lock(user_id):
+            cached = _cached_entry(user_id, version)
+            if cached is not None:
+                return cached
+            try:
+                vector_store = DiskVectorStore(os.path.join(store_path, version), get_embeddings())
+                logging.info(f"Index FAISS local ouvert depuis : {store_path} (génération {version})")
+                return _cache_entry(user_id, vector_store, version)
+            except Exception as e:
+                if _current_generation(store_path) != version:
+                    continue
+                logging.error(f"Erreur lors du chargement de l'index FAISS : {repr(e)}")
+                return None
+    return None
+
+def load_faiss_vector_store(user_id):
+    """
+    Charge le vector store FAISS d'un utilisateur.
+
+    Le store est conservé en mémoire et réutilisé tant que la génération publiée
+    sur disque ne change pas, dans la limite de STORE_CACHE_MAX_ENTRIES index. Le
+    store retourné ne doit pas être modifié : il est partagé par toutes les sessions
+    du processus, et fermé quand il est évincé du cache.
+
+    Args:
+        user_id (str): L'identifiant de l'utilisateur.
+
+    Returns:
+        DiskVectorStore: Le vector store de l'utilisateur, ou None s'il n'en a pas.
+    """
+    entry = _load_user_entry(user_id)
+    return entry["vector_store"] if entry else None
 
 def retrieve_documents(querry_text,filter_criteria, user_id, top_k=1):
-    vector_store = load_faiss_vector_store()  # Charger le vector store ici
-    if vector_store:
+    # Deux essais : le store a pu être évincé du cache (et fermé) pendant la recherche
+    for _ in range(2):
+        entry = _load_user_entry(user_id)  # Seul l'index de l'utilisateur est parcouru
+        if not entry:
+            return None
+        vector_store = entry["vector_store"]
         try:
-            # On recherche dans le vector store FAISS
-            results = vector_store.similarity_search(
-                querry_text,fetch_k=1000000 ,k=top_k, filter=filter_criteria
-            )
+            # Pré-filtrage (par date par exemple) : seuls les vecteurs retenus sont scorés
+            positions = vector_store.positions(filter_criteria) if filter_criteria else None
+            results = vector_store.search(querry_text, top_k, positions)
             if results is not None:
                 logging.info(f"{len(results)}informations intéressante trouvée pour {user_id}")
                 return results
             else:
                 logging.info("Aucune information intéressante trouvée")
+            return None
+        except sqlite3.ProgrammingError:
+            continue
         except Exception as e:
             logging.info(f"Erreur lors de la recherche de données : {repr(e)}")
+            return None
     return None
 
-def save_to_faiss(documents: list[Document]):
-    """
-    Sauvegarde un document à un vector store de FAISS.
-
-    Args:
-        documents (list[Document]): une liste de documents au format Langchain
-    """
+def _save_user_documents(user_id, documents: list[Document]):
+    store_path = user_faiss_path(user_id)
+    published = None
     try:
-        vector_store = load_faiss_vector_store()
-        # Création du vector store
-        if not vector_store:
-            logging.info("Création du vector store FAISS.")
-            # Si le fichier n'existe pas, on le crée
-            # On s'assure de toujours respecter les dimensions des vecteurs du modèle
-            index = faiss.IndexFlatL2(len(embeddings.embed_query("hello world")))
-            logging.info("Création du vector store FAISS.")
-            vector_store = FAISS(
-                embedding_function=embeddings,
-                index=index,
-                docstore=InMemoryDocstore(),
-                index_to_docstore_id={}
-            )
+        # Ouverte hors du cache des lecteurs, et refermée à la fin de la synchronisation
+        published = _open_published(store_path)
+        if not published:
+            logging.info(f"Création du vector store FAISS pour {user_id}.")
+        # {doc_id: (position, content_hash)} des documents publiés
+        existing = published.content_hashes() if published else {}
     except Exception as e:
         logging.error(f"Erreur lors de la création de l'index FAISS : {repr(e)}")
+        if published is not None:
+            published.close()
+        return False
     try:
-        vector_store.add_documents(documents=documents)
-        logging.info(f"Ajout de {len(documents)} documents dans {FAISS_PATH}")
-        vector_store.save_local(FAISS_PATH)
-        logging.info(f"Vectors store sauvegardé localement dans {FAISS_PATH} ")
-        
+        # Documents voulus, indexés par leur identifiant stable (le dernier doublon l'emporte)
+        wanted = {}
+        for doc in documents:
+            doc_id = doc.metadata.get("doc_id") or content_hash(doc.page_content)
+            doc.metadata["doc_id"] = doc_id
+            doc.metadata["content_hash"] = content_hash(doc.page_content)
+            wanted[doc_id] = doc
+
+        # Seuls les événements nouveaux ou modifiés sont embeddés, les autres gardent leur vecteur
+        unchanged = {
+            doc_id for doc_id, doc in wanted.items()
+            if doc_id in existing and existing[doc_id][1] == doc.metadata["content_hash"]
+        }
+        to_add = [doc_id for doc_id in wanted if doc_id not in unchanged]
+        removed = len(set(existing) - set(wanted))
+
+        if not to_add and not removed and published is not None:
+            logging.info(f"Index FAISS de {user_id} déjà à jour, aucune écriture")
+            return True
+
+        # Nouvelle génération complète : vecteurs repris de l'index publié ou calculés
+        dimension = get_embeddings().dimension()
+        vectors = np.empty((len(wanted), dimension), dtype="float32")
+        positions = {doc_id: position for position, doc_id in enumerate(wanted)}
+        if to_add:
+            vectors[[positions[doc_id] for doc_id in to_add]] = np.asarray(
+                get_embeddings().embed_documents([wanted[doc_id].page_content for doc_id in to_add]), dtype="float32"
+            )
+        if unchanged:
+            vectors[[positions[doc_id] for doc_id in unchanged]] = published.vectors([existing[doc_id][0] for doc_id in unchanged])
+        logging.info(
+            f"Synchronisation de {store_path} : {len(to_add)} ajout(s)/remplacement(s), "
+            f"{removed} suppression(s), {len(unchanged)} inchangé(s)"
+        )
+        # Index du type configuré (FAISS_INDEX_TYPE), entraîné seulement au premier build
+        index, trained, info = build_index(vectors, trained=published.trained_index() if published else None)
+        # Un index IVF-PQ ne garde que des vecteurs compressés : les vecteurs exacts sont
+        # conservés à côté pour ne pas dégrader les événements repris d'une génération à l'autre
+        exact = vectors if info["config"]["type"] == "ivf_pq" else None
+        generation = _publish_generation(user_id, index, list(wanted.values()), info, trained, exact)
+        logging.info(f"Vectors store sauvegardé localement dans {store_path} (génération {generation})")
+        return True
+
     except Exception as e:
+        # La génération publiée reste en place
         logging.error(f"Erreur lors de la sauvegarde des documents dans FAISS : {repr(e)}")
+        return False
+    finally:
+        if published is not None:
+            published.close()
+
+def save_to_faiss(documents: list[Document], user_id=None):
+    """
+    Synchronise les documents d'un ou plusieurs utilisateurs avec leur vector store FAISS.
+
+    Les documents sont répartis par `metadata['user_id']` : chaque utilisateur
+    possède son propre index dans FAISS_PATH. Pour chaque utilisateur, la liste
+    reçue est considérée comme son emploi du temps complet : les événements
+    inchangés (même identifiant, même contenu) ne sont pas ré-embeddés, les
+    événements modifiés sont remplacés et ceux qui ont disparu sont supprimés.
+
+    Args:
+        documents (list[Document]): une liste de documents au format Langchain
+        user_id (str, optional): L'utilisateur à qui appartiennent tous les documents.
+            À préciser pour synchroniser un seul emploi du temps : une liste vide
+            publie alors un index vide au lieu de laisser les anciens événements.
+
+    Returns:
+        bool: True si l'index de chaque utilisateur a été synchronisé.
+    """
+    documents_par_user = defaultdict(list)
+    if user_id is not None:
+        documents_par_user[user_id] = list(documents)
+    else:
+        for doc in documents:
+            documents_par_user[doc.metadata.get("user_id")].append(doc)
+
+    success = True
+    for user_id, user_documents in documents_par_user.items():
+        with _writer_lock(user_id):
+            success = _save_user_documents(user_id, user_documents) and success
+    return success
+
+
+# Tests
+class TestSaveUserDocuments:
+    """Vérifie la synchronisation d'un emploi du temps avec l'index d'un utilisateur (backend local)."""
+
+    class _CountingEmbeddings(HashingEmbeddings):
+        def __init__(self):
+            super().__init__(dimension=64)
+            self.embedded = []
+
+        def embed_documents(self, texts):
+            self.embedded.extend(texts)
+            return super().embed_documents(texts)
+
+    @staticmethod
+    def _doc(doc_id, content):
+        return Document(page_content=content, metadata={"doc_id": doc_id, "date": "2024-03-04"})
+
+    def _contents(self, user_id):
+        store = load_faiss_vector_store(user_id)
+        return sorted(doc.page_content for doc in store.documents(range(len(store))))
+
+    def test_sync(self, tmp_path, monkeypatch):
+        import sys
+        embeddings = self._CountingEmbeddings()
+        monkeypatch.setattr(sys.modules[__name__], "FAISS_PATH", str(tmp_path))
+        monkeypatch.setattr(sys.modules[__name__], "_embeddings", embeddings)
+        store_path = user_faiss_path("test")
+        documents = [self._doc("a", "Algorithmique"), self._doc("b", "Réseaux"), self._doc("c", "Anglais")]
+
+        # Ajout
+        assert save_to_faiss(documents, user_id="test")
+        assert _current_generation(store_path) == "gen-000001"
+        assert sorted(embeddings.embedded) == ["Algorithmique", "Anglais", "Réseaux"]
+
+        # Rien n'a changé : aucune nouvelle génération, rien n'est embeddé
+        embeddings.embedded.clear()
+        assert save_to_faiss(documents, user_id="test")
+        assert _current_generation(store_path) == "gen-000001"
+        assert embeddings.embedded == []
+
+        # Un événement modifié : seul lui est ré-embeddé
+        documents[1] = self._doc("b", "Réseaux (salle changée)")
+        assert save_to_faiss(documents, user_id="test")
+        assert _current_generation(store_path) == "gen-000002"
+        assert embeddings.embedded == ["Réseaux (salle changée)"]
+        assert self._contents("test") == ["Algorithmique", "Anglais", "Réseaux (salle changée)"]
+
+        # Un événement supprimé : les autres gardent leur vecteur
+        embeddings.embedded.clear()
+        assert save_to_faiss(documents[:2], user_id="test")
+        assert _current_generation(store_path) == "gen-000003"
+        assert embeddings.embedded == []
+        assert self._contents("test") == ["Algorithmique", "Réseaux (salle changée)"]
+        assert retrieve_documents("Algorithmique", {"date": ["2024-03-04"]}, "test")[0].page_content == "Algorithmique"
+
+        # Emploi du temps vide : l'index est vidé
+        assert save_to_faiss([], user_id="test")
+        assert self._contents("test") == []
+        _uncache("test")
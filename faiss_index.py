@@ -0,0 +1,196 @@
+import logging
+import os
+
+import faiss
+import numpy as np
+
+###################VARIABLES###################
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat").lower()
+# En dessous de ce nombre de vecteurs, la recherche exacte reste la plus rapide : on garde un index plat
+FAISS_APPROX_MIN_VECTORS = int(os.getenv("FAISS_APPROX_MIN_VECTORS", "10000"))
+FAISS_TRAINING_SAMPLE = int(os.getenv("FAISS_TRAINING_SAMPLE", "100000"))  # Vecteurs maximum pour l'entraînement
+FAISS_RETRAIN_FACTOR = 8  # Ré-entraînement quand le corpus a grossi de ce facteur depuis l'entraînement
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "80"))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "0"))  # 0 : environ 4 * racine(nombre de vecteurs)
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "32"))  # Sous-quantificateurs (ajusté pour diviser la dimension)
+FAISS_PQ_NBITS = int(os.getenv("FAISS_PQ_NBITS", "8"))
+# IVF-PQ : candidats lus par résultat demandé, reclassés ensuite avec les vecteurs exacts
+FAISS_PQ_RERANK = int(os.getenv("FAISS_PQ_RERANK", "10"))
+##############################################
+
+
+def index_config(index_type=FAISS_INDEX_TYPE):
+    """
+    Retourne la configuration d'index demandée (type et paramètres de construction).
+
+    Args:
+        index_type (str): "flat", "hnsw", "ivf_flat" ou "ivf_pq".
+
+    Raises:
+        ValueError: Si le type d'index est inconnu.
+
+    Returns:
+        dict: Le type et ses paramètres de construction.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Type d'index FAISS inconnu : {index_type} (attendu : {', '.join(INDEX_TYPES)})")
+    config = {"type": index_type}
+    if index_type == "hnsw":
+        config.update(m=FAISS_HNSW_M, ef_construction=FAISS_HNSW_EF_CONSTRUCTION)
+    elif index_type.startswith("ivf"):
+        config.update(nlist=FAISS_IVF_NLIST)
+        if index_type == "ivf_pq":
+            config.update(pq_m=FAISS_PQ_M, pq_nbits=FAISS_PQ_NBITS)
+    return config
+
+
+def _nlist(config, nb_vectors):
+    if config.get("nlist"):
+        return config["nlist"]
+    # Au moins 39 vecteurs d'entraînement par centroïde, comme le recommande FAISS
+    return int(max(1, min(4 * np.sqrt(nb_vectors), nb_vectors // 39)))
+
+
+def _pq_m(dimension, pq_m):
+    # Le nombre de sous-quantificateurs doit diviser la dimension
+    return max(m for m in range(1, min(pq_m, dimension) + 1) if dimension % m == 0)
+
+
+def _training_sample(vectors, size):
+    if len(vectors) <= size:
+        return vectors
+    rng = np.random.default_rng(0)
+    return vectors[np.sort(rng.choice(len(vectors), size, replace=False))]
+
+
+def train_index(vectors, config):
+    """
+    Crée un index vide, entraîné sur un échantillon de `vectors` si son type le demande.
+
+    Args:
+        vectors (np.ndarray): Les vecteurs (float32, une ligne par vecteur).
+        config (dict): La configuration, voir `index_config`.
+
+    Returns:
+        faiss.Index: L'index vide.
+    """
+    dimension = vectors.shape[1]
+    index_type = config["type"]
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dimension)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, config["m"])
+        index.hnsw.efConstruction = config["ef_construction"]
+        return index
+
+    nlist = _nlist(config, len(vectors))
+    quantizer = faiss.IndexFlatL2(dimension)
+    if index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, _pq_m(dimension, config["pq_m"]), config["pq_nbits"])
+    sample = _training_sample(vectors, max(FAISS_TRAINING_SAMPLE, nlist * 39))
+    index.train(sample)
+    logging.info(f"Index {index_type} entraîné sur {len(sample)} vecteurs ({nlist} listes)")
+    return index
+
+
+def build_index(vectors, config=None, trained=None):
+    """
+    Construit l'index FAISS d'un ensemble de vecteurs.
+
+    Sous FAISS_APPROX_MIN_VECTORS vecteurs, un index plat (recherche exacte) est
+    utilisé quel que soit le type demandé. Un index vide déjà entraîné (`trained`)
+    est réutilisé s'il a la même configuration et que le corpus n'a pas trop grossi
+    depuis son entraînement : seul le premier build d'un index paie l'entraînement.
+
+    Args:
+        vectors (np.ndarray): Les vecteurs (float32, une ligne par vecteur).
+        config (dict, optional): La configuration demandée, `index_config()` par défaut.
+        trained (tuple[faiss.Index, dict], optional): Un index vide entraîné et ses
+            informations (voir le retour).
+
+    Returns:
+        tuple[faiss.Index, faiss.Index | None, dict]: L'index rempli, l'index vide
+        entraîné à conserver pour les prochains builds (None s'il n'y a pas
+        d'entraînement) et les informations de l'index ("config", "trained_on").
+    """
+    config = config or index_config()
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    if config["type"] != "flat" and len(vectors) < FAISS_APPROX_MIN_VECTORS:
+        config = {"type": "flat"}
+
+    empty, info = None, {"config": config, "trained_on": len(vectors)}
+    if trained is not None:
+        trained_index, trained_info = trained
+        if trained_info.get("config") == config and len(vectors) < FAISS_RETRAIN_FACTOR * trained_info.get("trained_on", 0):
+            empty, info = trained_index, trained_info
+    if empty is None:
+        empty = train_index(vectors, config)
+
+    index = faiss.clone_index(empty)
+    if len(vectors):
+        index.add(vectors)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()  # Permet reconstruct() sur les candidats d'une recherche filtrée
+    return index, (empty if config["type"].startswith("ivf") else None), info
+
+
+def index_kind(index):
+    """Retourne "hnsw", "ivf" ou "flat" selon la famille de l'index."""
+    if isinstance(faiss.downcast_index(index), faiss.IndexHNSW):
+        return "hnsw"
+    if faiss.try_extract_index_ivf(index) is not None:
+        return "ivf"
+    return "flat"
+
+
+def exact_top_k(query_vector, positions, vectors, k):
+    """
+    Classe des candidats par distance L2 exacte à la requête.
+
+    Args:
+        query_vector (np.ndarray): La requête (une ligne).
+        positions (np.ndarray): Les positions des candidats.
+        vectors (np.ndarray): Les vecteurs des candidats, dans le même ordre.
+        k (int): Le nombre de positions voulues.
+
+    Returns:
+        np.ndarray: Les `k` positions les plus proches, de la plus proche à la plus éloignée.
+    """
+    distances = ((np.asarray(vectors, dtype="float32") - query_vector) ** 2).sum(axis=1)
+    return np.asarray(positions)[np.argsort(distances, kind="stable")[:k]]
+
+
+def search_parameters(index, selector=None, nprobe=FAISS_IVF_NPROBE, ef_search=FAISS_HNSW_EF_SEARCH):
+    """
+    Retourne les paramètres de recherche adaptés au type de l'index.
+
+    Args:
+        index (faiss.Index): L'index.
+        selector (faiss.IDSelector, optional): Les seules positions candidates.
+        nprobe (int): Nombre de listes parcourues (index IVF).
+        ef_search (int): Taille de la file de recherche (index HNSW).
+
+    Returns:
+        faiss.SearchParameters | None: Les paramètres, ou None s'il n'y en a aucun.
+    """
+    kind = index_kind(index)
+    if kind == "hnsw":
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search
+    elif kind == "ivf":
+        params = faiss.SearchParametersIVF()
+        params.nprobe = nprobe
+    elif selector is None:
+        return None
+    else:
+        params = faiss.SearchParameters()
+    if selector is not None:
+        params.sel = selector
+    return params
@@ -0,0 +1,183 @@
+from datetime import datetime, time, timedelta
+
+from event_store import LOCAL_TZ, day_bounds
+
+
+def merge_intervals(intervals):
+    """
+    Fusionne des intervalles [début, fin[ qui se chevauchent ou se touchent.
+
+    Args:
+        intervals (list[tuple[int, int]]): Des intervalles en secondes epoch.
+
+    Returns:
+        list[tuple[int, int]]: Les intervalles fusionnés, triés.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_intervals(busy, start, end):
+    """
+    Retourne les trous de [start, end[ laissés libres par des intervalles occupés fusionnés.
+
+    Args:
+        busy (list[tuple[int, int]]): Les intervalles occupés, fusionnés et triés.
+        start (int): Début de la plage, en secondes epoch.
+        end (int): Fin de la plage, en secondes epoch.
+
+    Returns:
+        list[tuple[int, int]]: Les intervalles libres.
+    """
+    free = []
+    cursor = start
+    for busy_start, busy_end in busy:
+        if busy_end <= cursor:
+            continue
+        if busy_start >= end:
+            break
+        if busy_start > cursor:
+            free.append((cursor, busy_start))
+        cursor = max(cursor, busy_end)
+    if cursor < end:
+        free.append((cursor, end))
+    return free
+
+
+def split_slot(start, end, min_duration, max_duration):
+    """
+    Découpe un intervalle libre en créneaux d'au plus `max_duration`.
+
+    Le dernier morceau n'est gardé que s'il dure au moins `min_duration`.
+
+    Returns:
+        list[tuple[int, int]]: Les créneaux.
+    """
+    slots = []
+    while end - start >= min_duration:
+        slot_end = min(start + max_duration, end)
+        slots.append((start, slot_end))
+        start = slot_end
+    return slots
+
+
+def _at(day, hour):
+    return int(LOCAL_TZ.localize(datetime.combine(day, hour)).timestamp())
+
+
+def common_free_slots(stores, dates, day_start=time(7), day_end=time(18),
+                      min_duration=timedelta(hours=1), max_duration=timedelta(hours=2)):
+    """
+    Calcule les créneaux où tous les participants sont disponibles.
+
+    Pour chaque date, les cours de tous les participants compris dans la plage
+    [day_start, day_end] sont fusionnés ; les trous restants sont découpés en
+    créneaux d'une durée comprise entre `min_duration` et `max_duration`.
+
+    Args:
+        stores (list[EventStore]): L'emploi du temps de chaque participant.
+        dates (list[str | date]): Les dates à examiner.
+        day_start (time): Heure de début de la plage de travail.
+        day_end (time): Heure de fin de la plage de travail.
+        min_duration (timedelta): Durée minimale d'un créneau.
+        max_duration (timedelta): Durée maximale d'un créneau.
+
+    Raises:
+        ValueError: Si les durées ne sont pas cohérentes.
+
+    Returns:
+        List[Dict[str, str]]: Les créneaux triés, avec les clés "date" ('YYYY-MM-DD'),
+        "début" et "fin" ('HH:MM') et "durée" (ex: '1h30'). Liste vide s'il n'y a
+        aucun participant.
+    """
+    min_seconds = int(min_duration.total_seconds())
+    max_seconds = int(max_duration.total_seconds())
+    if min_seconds <= 0 or max_seconds < min_seconds:
+        raise ValueError("La durée minimale doit être positive et inférieure à la durée maximale.")
+    slots = []
+    if not stores:
+        # Aucun participant : aucune disponibilité ne peut être dite commune
+        return slots
+    for day in sorted(set(dates), key=str):
+        day_date = datetime.fromtimestamp(day_bounds(day)[0], LOCAL_TZ).date()
+        window_start, window_end = _at(day_date, day_start), _at(day_date, day_end)
+        busy = []
+        for store in stores:
+            for position in store.overlapping(window_start, window_end):
+                busy.append((int(store.starts[position]), int(store.ends[position])))
+        for free_start, free_end in free_intervals(merge_intervals(busy), window_start, window_end):
+            for slot_start, slot_end in split_slot(free_start, free_end, min_seconds, max_seconds):
+                minutes = (slot_end - slot_start) // 60
+                slots.append({
+                    "date": day_date.isoformat(),
+                    "début": datetime.fromtimestamp(slot_start, LOCAL_TZ).strftime('%H:%M'),
+                    "fin": datetime.fromtimestamp(slot_end, LOCAL_TZ).strftime('%H:%M'),
+                    "durée": f"{minutes // 60}h{minutes % 60:02d}" if minutes % 60 else f"{minutes // 60}h",
+                })
+    return slots
+
+
+# Tests
+class TestFreeSlots:
+    """Vérifie le calcul des intervalles libres et des créneaux communs."""
+
+    DAY = "2024-03-05"
+
+    @staticmethod
+    def _store(*hours):
+        """EventStore d'un participant ayant cours le 2024-03-05 aux heures (début, fin) données."""
+        from event_store import EventStore
+        return EventStore.from_events([
+            {
+                "begin": LOCAL_TZ.localize(datetime(2024, 3, 5) + timedelta(hours=start)),
+                "end": LOCAL_TZ.localize(datetime(2024, 3, 5) + timedelta(hours=end)),
+                "name": "Cours",
+                "description": "Cours\nProfesseur",
+            }
+            for start, end in hours
+        ])
+
+    def _slots(self, stores, **kwargs):
+        return [(slot["début"], slot["fin"]) for slot in common_free_slots(stores, [self.DAY], **kwargs)]
+
+    def test_merge_touching_and_overlapping(self):
+        """Les intervalles qui se touchent ou se chevauchent sont fusionnés, les autres non."""
+        assert merge_intervals([(5, 8), (0, 2), (2, 4), (6, 7), (9, 10)]) == [(0, 4), (5, 8), (9, 10)]
+        assert merge_intervals([]) == []
+
+    def test_free_intervals_at_window_bounds(self):
+        """Les occupations qui débordent de la plage la réduisent sans créer de trou hors plage."""
+        assert free_intervals([(0, 12), (14, 16), (18, 30)], 10, 20) == [(12, 14), (16, 18)]
+        assert free_intervals([(0, 5), (25, 30)], 10, 20) == [(10, 20)]
+        assert free_intervals([(0, 30)], 10, 20) == []
+        assert free_intervals([], 10, 20) == [(10, 20)]
+
+    def test_split_slot_drops_short_remainder(self):
+        """Un reste plus court que la durée minimale est abandonné."""
+        assert split_slot(0, 300, 60, 120) == [(0, 120), (120, 240), (240, 300)]
+        assert split_slot(0, 290, 60, 120) == [(0, 120), (120, 240)]
+        assert split_slot(0, 50, 60, 120) == []
+
+    def test_no_participant(self):
+        """Sans participant, aucun créneau n'est présenté comme commun."""
+        assert self._slots([]) == []
+
+    def test_events_crossing_the_window(self):
+        """Les cours qui débordent sur le début ou la fin de la plage de travail la réduisent."""
+        store = self._store((6, 8), (17, 19))
+        assert self._slots([store], day_start=time(7), day_end=time(18)) == [
+            ("08:00", "10:00"), ("10:00", "12:00"), ("12:00", "14:00"), ("14:00", "16:00"), ("16:00", "17:00"),
+        ]
+
+    def test_several_participants(self):
+        """Un créneau n'est commun que si aucun des participants n'a cours."""
+        stores = [self._store((8, 10)), self._store((9, 11), (13, 14)), self._store((15, 16))]
+        assert self._slots(stores, day_start=time(8), day_end=time(18)) == [
+            ("11:00", "13:00"), ("14:00", "15:00"), ("16:00", "18:00"),
+        ]
@@ -6,8 +6,172 @@ from guardrails.validator_base import (
     Validator,
     register_validator,
 )
+import hashlib
+import json
+import logging
+import os
 import re
-from MauvaiseLangue import scrape_insultes  # Fonction pour obtenir la liste des insultes
+import threading
+import time
+
+INSULTES_CACHE_PATH = "insultes_cache/insultes.json"  # Copie locale de la liste des insultes
+INSULTES_CACHE_TTL = int(os.getenv("INSULTES_CACHE_TTL", str(7 * 24 * 3600)))  # Âge maximum avant de re-scraper (s)
+
+_latest_entry = None  # Dernière version du lexique chargée ou scrapée par le processus
+
+
+def lexicon_version(insultes):
+    """Returns a fingerprint of the lexicon: it changes as soon as an insult is added or removed."""
+    return hashlib.sha1("\n".join(sorted(insultes)).encode("utf-8")).hexdigest()
+
+
+def _read_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.error(f"Erreur lors de la lecture du cache des insultes: {repr(e)}")
+        return None
+
+
+def _set_latest_entry(entry):
+    global _latest_entry
+    _latest_entry = entry
+
+
+def refresh_insultes(path=INSULTES_CACHE_PATH):
+    """
+    Scrapes the list of insults and stores it in the local cache.
+
+    The scraper is only imported here, so that loading the validator never
+    requires network access when a cached copy exists.
+
+    Args:
+        path (str): The cache file.
+
+    Returns:
+        dict | None: The cache entry ("version", "fetched_at", "insultes"), or None if the scrape failed.
+    """
+    try:
+        from MauvaiseLangue import scrape_insultes  # Fonction pour obtenir la liste des insultes
+        insultes = sorted({insult.strip().lower() for insult in scrape_insultes() if insult.strip()})
+        if not insultes:
+            raise ValueError("liste d'insultes vide")
+        entry = {"version": lexicon_version(insultes), "fetched_at": time.time(), "insultes": insultes}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(entry, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        logging.info(f"{len(insultes)} insultes enregistrées (version {entry['version'][:8]})")
+        _set_latest_entry(entry)
+        return entry
+    except Exception as e:
+        logging.error(f"Erreur lors du scraping des insultes: {repr(e)}")
+        return None
+
+
+def load_insultes(path=INSULTES_CACHE_PATH, max_age=INSULTES_CACHE_TTL):
+    """
+    Loads the list of insults from the local cache.
+
+    The network is only used when no cached copy exists. A copy older than
+    `max_age` is still returned, and is refreshed in a background thread;
+    validators built from the cache switch to the refreshed lexicon on their
+    next detection.
+
+    Args:
+        path (str): The cache file.
+        max_age (float): Maximum age of the cached copy, in seconds.
+
+    Returns:
+        dict: The cache entry ("version", "fetched_at", "insultes").
+
+    Raises:
+        RuntimeError: If there is no cached copy and the scrape failed: an empty
+            lexicon would let every insult through.
+    """
+    entry = _read_cache(path)
+    if entry is None:
+        entry = refresh_insultes(path)
+        if entry is None:
+            raise RuntimeError("Aucune liste d'insultes disponible : pas de cache et le scraping a échoué")
+    else:
+        _set_latest_entry(entry)
+        if time.time() - entry.get("fetched_at", 0) > max_age:
+            threading.Thread(target=refresh_insultes, args=(path,), daemon=True).start()
+    return entry
+
+
+def compile_insultes(insultes):
+    """
+    Compiles a list of insults into a single regular expression.
+
+    The insults are merged into a trie, turned into nested alternations sharing
+    their common prefixes, so the whole lexicon is matched in one pass over the
+    text. Each insult must match as a whole word, so "con" does not match "conseil".
+    The pattern is a lookahead: it matches at every position where an insult
+    starts, even inside a longer one, and captures the longest insult (group 1).
+
+    Args:
+        insultes (list[str]): The insults, in lowercase.
+
+    Returns:
+        re.Pattern | None: The compiled pattern, or None if the list is empty.
+    """
+    trie = {}
+    for insult in insultes:
+        node = trie
+        for char in insult:
+            node = node.setdefault(char, {})
+        node[""] = {}  # Fin d'une insulte
+
+    def to_pattern(node):
+        branches = [re.escape(char) + to_pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Une insulte se termine ici : la suite est optionnelle (la plus longue est essayée d'abord)
+        return f"(?:{pattern})?" if "" in node else pattern
+
+    if not trie:
+        return None
+    return re.compile(r"(?=\b(" + to_pattern(trie) + r")\b)")
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+def find_insultes(pattern, insultes, text):
+    """
+    Lists the insults of the lexicon found in a lowercase text, in order of appearance.
+
+    Overlapping insults are all reported, as with one search per insult:
+    "fils de pute" reports both "fils de pute" and "pute", and "sale con" also
+    reports "sale" if it is in the lexicon.
+
+    Args:
+        pattern (re.Pattern | None): The pattern returned by `compile_insultes`.
+        insultes (set[str]): The lexicon.
+        text (str): The text, in lowercase.
+
+    Returns:
+        list[str]: The insults found, without duplicates.
+    """
+    if pattern is None:
+        return []
+    found = []
+    for match in pattern.finditer(text):
+        longest = match.group(1)
+        # Shorter insults starting at the same position, ending on a word boundary
+        for end in range(1, len(longest)):
+            if _is_word_char(longest[end - 1]) != _is_word_char(longest[end]) and longest[:end] in insultes:
+                found.append(longest[:end])
+        found.append(longest)
+    return list(dict.fromkeys(found))
 
 @register_validator(name="guardrails/french_toxic_language", data_type="string")
 class FrenchToxicLanguage(Validator):
@@ -16,16 +180,29 @@ class FrenchToxicLanguage(Validator):
     This validator checks if the given text contains any French insults based on a predefined list of insults.
     """
 
-    def __init__(self, on_fail: Optional[Callable] = None):
+    def __init__(self, on_fail: Optional[Callable] = None, insultes: Optional[list] = None):
         """
         Initializes the FrenchToxicLanguage validator.
         
         Args:
             on_fail (Callable, optional): Action to perform when validation fails (e.g., reask, fix, filter).
+            insultes (list, optional): The insults to detect, in lowercase, instead of the cached lexicon.
         """
         super().__init__(on_fail=on_fail)
-        # Load insults using the scrape function
-        self.insultes = scrape_insultes()
+        # An explicit list is kept as is; the cached lexicon follows background refreshes
+        self._follows_cache = insultes is None
+        if insultes is None:
+            # Load insults from the local cache, scraped only if there is none yet
+            entry = load_insultes()
+        else:
+            entry = {"version": lexicon_version(insultes), "insultes": list(insultes)}
+        self._use_lexicon(entry)
+
+    def _use_lexicon(self, entry):
+        self.insultes = entry["insultes"]
+        self.version = entry["version"]
+        # Pattern and lexicon are swapped together, so concurrent detections never mix two versions
+        self._matcher = (compile_insultes(self.insultes), set(self.insultes))
 
     def validate(self, value: Any, metadata: Dict) -> ValidationResult:
         """
@@ -52,25 +229,24 @@ class FrenchToxicLanguage(Validator):
         """
         Detects French insults in the given text using a list of known insults.
         
-        This function uses regular expressions to check for the presence of each insult as a whole word 
-        in the text, ensuring partial matches (e.g., "con" in "conseil") are ignored.
+        The whole lexicon is compiled into a single regular expression (see `compile_insultes`),
+        so the text is scanned once; insults must match as whole words, ensuring partial
+        matches (e.g., "con" in "conseil") are ignored. Overlapping insults are all
+        reported (see `find_insultes`).
         
         Args:
             text (str): The input text to check for insults.
         
         Returns:
-            list: A list of detected insults found in the text.
+            list: A list of detected insults found in the text, in order of appearance.
         """
+        latest = _latest_entry
+        if self._follows_cache and latest is not None and latest["version"] != self.version:
+            # The lexicon was refreshed in the background: recompile it once
+            self._use_lexicon(latest)
+        pattern, insultes = self._matcher
         text = text.lower()  # Convert text to lowercase for case-insensitive matching
-        detected_insultes = []
-        
-        for insult in self.insultes:
-            # Create a regex pattern to match the insult as a whole word
-            pattern = r'\b' + re.escape(insult.lower()) + r'\b'
-            if re.search(pattern, text):
-                detected_insultes.append(insult)
-        
-        return detected_insultes
+        return find_insultes(pattern, insultes, text)
 
 # Tests
 class TestFrenchToxicLanguage:
@@ -88,3 +264,67 @@ class TestFrenchToxicLanguage:
         result = validator.validate("Tu es un idiot.", {})
         assert isinstance(result, FailResult)
         assert "idiot" in result.error_message
+
+    LEXIQUE = ["con", "connard", "conne", "idiot", "fils de pute", "pute", "sale", "sale con", "abruti"]
+
+    @staticmethod
+    def _per_insult(insultes, text):
+        """Former implementation: one whole-word search per insult."""
+        text = text.lower()
+        return {insult for insult in insultes if re.search(r'\b' + re.escape(insult) + r'\b', text)}
+
+    def test_word_boundaries(self):
+        """An insult is only detected as a whole word (no network needed)."""
+        validator = FrenchToxicLanguage(insultes=self.LEXIQUE)
+        assert validator.detect_insultes("Quel conseil me donnes-tu ?") == []
+        assert validator.detect_insultes("Espèce de connard.") == ["connard"]
+        assert validator.detect_insultes("T'es con, vraiment CON !") == ["con"]
+        assert validator.detect_insultes("Une conne et un connard") == ["conne", "connard"]
+
+    def test_multi_word_and_overlapping(self):
+        """Multi-word insults are detected, along with the insults they contain."""
+        validator = FrenchToxicLanguage(insultes=self.LEXIQUE)
+        assert validator.detect_insultes("Fils de pute !") == ["fils de pute", "pute"]
+        assert validator.detect_insultes("Sale con.") == ["sale", "sale con", "con"]
+        assert validator.detect_insultes("Le fils de Paul") == []
+
+    def test_equivalence_with_per_insult_search(self):
+        """The single pass finds the same insults as one search per insult."""
+        validator = FrenchToxicLanguage(insultes=self.LEXIQUE)
+        texts = [
+            "Bonjour, comment ça va ?",
+            "sale con de fils de pute, abruti d'idiot",
+            "connard,conne;con.sale-con",
+            "idiots et abrutis",
+            "le con_cours du con",
+        ]
+        for text in texts:
+            assert set(validator.detect_insultes(text)) == self._per_insult(self.LEXIQUE, text)
+
+    def test_empty_lexicon(self):
+        assert compile_insultes([]) is None
+        assert FrenchToxicLanguage(insultes=[]).detect_insultes("connard") == []
+
+    def test_follows_lexicon_refresh(self, tmp_path, monkeypatch):
+        """A validator built from the cache uses a refreshed lexicon without restarting."""
+        import sys
+        module = sys.modules[__name__]
+        path = str(tmp_path / "insultes.json")
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"version": lexicon_version(["idiot"]), "fetched_at": time.time(), "insultes": ["idiot"]}, file)
+        monkeypatch.setattr(module, "_latest_entry", None)
+        entry = load_insultes(path)
+        monkeypatch.setattr(module, "load_insultes", lambda: entry)
+        validator = FrenchToxicLanguage()
+        assert validator.detect_insultes("idiot et abruti") == ["idiot"]
+        _set_latest_entry({"version": lexicon_version(["idiot", "abruti"]), "insultes": ["abruti", "idiot"]})
+        assert validator.detect_insultes("idiot et abruti") == ["idiot", "abruti"]
+        assert FrenchToxicLanguage(insultes=["con"]).detect_insultes("idiot et con") == ["con"]
+
+    def test_no_lexicon_fails_closed(self, tmp_path, monkeypatch):
+        """Without a cached copy, a failed scrape raises instead of installing an empty lexicon."""
+        import sys
+        import pytest
+        monkeypatch.setattr(sys.modules[__name__], "refresh_insultes", lambda path: None)
+        with pytest.raises(RuntimeError):
+            load_insultes(str(tmp_path / "insultes.json"))
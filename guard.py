@@ -1,22 +1,38 @@
 import os
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
-from openai import OpenAI
 from dotenv import load_dotenv
-from guardrails import Guard
-from guardrails.hub import QARelevanceLLMEval
-from french_toxic_language_validator import FrenchToxicLanguage
-from deep_translator import GoogleTranslator
 import logging
 import warnings
 import re
+import hashlib
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 # Désactiver les warnings inutiles
 warnings.filterwarnings("ignore", category=UserWarning, module="pydantic")
 
 # Charger les variables d'environnement
 load_dotenv()
 
+# Les clients et validateurs, coûteux à importer et à construire, sont créés au premier usage
+_client = None
+_guard_fr = None
+_guard_en = None
+_init_lock = threading.Lock()
+
+
 # Configuration de l'API OpenAI
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+def get_client():
+    """Retourne le client OpenAI partagé, créé au premier appel."""
+    global _client
+    with _init_lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        return _client
 
 # Prompt principal du chatbot
 META_PROMPT = """Tu es un assistant universitaire virtuel dédié à aider les étudiants dans leurs études et leur organisation universitaire.
@@ -40,17 +56,36 @@ Ton objectif est de fournir des conseils, guider les étudiants, une aide utile,
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 # Initialisation des validateurs de Guardrails
-guard_fr = Guard().use(FrenchToxicLanguage(on_fail="reask"))
-guard_en = Guard().use_many(
-    QARelevanceLLMEval(on_fail="reask")
-)
+def get_guard_fr():
+    """Retourne le Guard de détection des insultes, créé au premier appel."""
+    global _guard_fr
+    with _init_lock:
+        if _guard_fr is None:
+            from guardrails import Guard
+            from french_toxic_language_validator import FrenchToxicLanguage
+            _guard_fr = Guard().use(FrenchToxicLanguage(on_fail="reask"))
+            logging.info("Validateur d'insultes initialisé")
+        return _guard_fr
+
+def get_guard_en():
+    """Retourne le Guard de vérification de la pertinence (LLM), créé au premier appel."""
+    global _guard_en
+    with _init_lock:
+        if _guard_en is None:
+            from guardrails import Guard
+            from guardrails.hub import QARelevanceLLMEval
+            _guard_en = Guard().use_many(
+                QARelevanceLLMEval(on_fail="reask")
+            )
+            logging.info("Validateur de pertinence initialisé")
+        return _guard_en
 
 # Fonction pour générer une réponse avec OpenAI
 def generate_response(prompt):
     logging.info("Génération de la réponse...")
     try:
         if prompt:  # Vérifie que le prompt n'est pas vide
-            completion = client.chat.completions.create(
+            completion = get_client().chat.completions.create(
                 messages=[
                     {"role": "system", "content": META_PROMPT},
                     {"role": "user", "content": prompt},
@@ -68,33 +103,133 @@ def generate_response(prompt):
         print("Erreur lors de la génération de la réponse.")
         return None
 
+TRANSLATION_CHUNK_SIZE = 4500  # GoogleTranslator refuse les textes de plus de 5000 caractères
+TRANSLATION_MAX_WORKERS = int(os.getenv("TRANSLATION_MAX_WORKERS", "4"))
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "1024"))
+
+# Cache LRU des traductions, par (empreinte du texte, langue cible)
+_translation_cache = OrderedDict()
+_translation_cache_lock = threading.Lock()
+# Un traducteur par langue cible et par thread : GoogleTranslator modifie ses paramètres à chaque appel
+_translators = threading.local()
+# Pool partagé par toutes les traductions, créé au premier texte long : ses threads, et
+# donc leurs traducteurs, sont réutilisés d'un appel à l'autre
+_translation_executor = None
+
+
+def _get_translation_executor():
+    global _translation_executor
+    with _init_lock:
+        if _translation_executor is None:
+            _translation_executor = ThreadPoolExecutor(
+                max_workers=max(1, TRANSLATION_MAX_WORKERS), thread_name_prefix="traduction"
+            )
+        return _translation_executor
+
+
+def _get_translator(target_langue):
+    translators = getattr(_translators, "by_target", None)
+    if translators is None:
+        translators = _translators.by_target = {}
+    if target_langue not in translators:
+        from deep_translator import GoogleTranslator
+        translators[target_langue] = GoogleTranslator(source='auto', target=target_langue)
+    return translators[target_langue]
+
+
+def split_sentences(text, max_chars=TRANSLATION_CHUNK_SIZE):
+    """
+    Découpe un texte en morceaux d'au plus `max_chars` caractères, aux fins de phrases.
+
+    Chaque morceau garde ses espaces et retours à la ligne finaux, de sorte que
+    leur concaténation redonne exactement le texte. Une phrase trop longue est
+    coupée au dernier espace possible.
+
+    Args:
+        text (str): Le texte.
+        max_chars (int): La taille maximale d'un morceau.
+
+    Returns:
+        list[str]: Les morceaux.
+    """
+    sentences = re.findall(r".*?(?:[.!?…]+(?=\s|$)|\n|$)\s*", text, flags=re.S)
+    chunks, current = [], ""
+    for sentence in sentences:
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars) + 1 or max_chars
+            sentence, rest = sentence[cut:], sentence[:cut]
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(rest)
+        if len(current) + len(sentence) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _translate_chunk(chunk, target_langue):
+    key = (hashlib.sha1(chunk.encode("utf-8")).hexdigest(), target_langue)
+    with _translation_cache_lock:
+        if key in _translation_cache:
+            _translation_cache.move_to_end(key)
+            return _translation_cache[key]
+    content = chunk.strip()
+    # Les espaces autour du morceau sont conservés tels quels pour le réassemblage
+    translated = chunk[:len(chunk) - len(chunk.lstrip())]
+    if content:
+        translated += _get_translator(target_langue).translate(text=content)
+    translated += chunk[len(chunk.rstrip()):]
+    with _translation_cache_lock:
+        _translation_cache[key] = translated
+        while len(_translation_cache) > TRANSLATION_CACHE_MAX_ENTRIES:
+            _translation_cache.popitem(last=False)
+    return translated
+
+
 # Fonction pour traduire un texte
 def translate_text(text, target_langue):
+    """
+    Traduit un texte dans la langue cible.
+
+    Les traductions sont mises en cache. Un texte long est découpé aux fins de
+    phrases (voir `split_sentences`), ses morceaux sont traduits en parallèle puis
+    réassemblés ; un morceau déjà traduit n'est pas retraduit.
+
+    Args:
+        text (str): Le texte à traduire.
+        target_langue (str): La langue cible (ex: "en", "fr").
+
+    Returns:
+        str | None: La traduction, ou None si le texte est vide ou en cas d'erreur.
+    """
     try:
-        if text and len(text) <= 5000:  # Vérifie que le texte n'est pas vide et ne dépasse pas 5000 caractères
-            return GoogleTranslator(source='auto', target=target_langue).translate(text=text)
-        else:
-            logging.error("Texte vide ou dépasse la limite de 5000 caractères.")
+        if not text:  # Vérifie que le texte n'est pas vide
+            logging.error("Texte vide.")
             return None
+        if len(text) <= TRANSLATION_CHUNK_SIZE:
+            return _translate_chunk(text, target_langue)
+        chunks = split_sentences(text)
+        logging.info(f"Traduction de {len(text)} caractères en {len(chunks)} morceaux")
+        executor = _get_translation_executor()
+        return "".join(executor.map(lambda chunk: _translate_chunk(chunk, target_langue), chunks))
     except Exception as e:
         logging.error("Erreur de traduction : %s", str(e))
         return None
 
-# Fonction pour détecter les informations personnelles, y compris les numéros de téléphone d'ici (Nouvelle-Calédonie).
-def contains_personally_identifiable_information(text):
-    patterns = [
-        r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}",  # Emails
-        r"\(\+687\) \d{2}\.\d{2}\.\d{2}",  # Numéro formaté avec le code (+687)
-        r"\b\d{2}\.\d{2}\.\d{2}\b",  # Numéro au format 54.06.54
-        r"\b\d{6}\b",  # Numéro compact comme 540654
-        r"\b\d{3} \d{3}\b",  # Numéro avec espace comme 541 153
-        r"\b\d{3}\.\d{3}\b",  # Numéro au format 541.153
-        r"\b\d{2}\ \d{2}\ \d{2}\b",  # Numéro au format 54 06 54
-    ]
-    for pattern in patterns:
-        if re.search(pattern, text):
-            return True
-    return False
+# Motifs des informations personnelles, y compris les numéros de téléphone d'ici (Nouvelle-Calédonie).
+PII_PATTERNS = [
+    r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}",  # Emails
+    r"\(\+687\) \d{2}\.\d{2}\.\d{2}",  # Numéro formaté avec le code (+687)
+    r"\b\d{2}\.\d{2}\.\d{2}\b",  # Numéro au format 54.06.54
+    r"\b\d{6}\b",  # Numéro compact comme 540654
+    r"\b\d{3} \d{3}\b",  # Numéro avec espace comme 541 153
+    r"\b\d{3}\.\d{3}\b",  # Numéro au format 541.153
+    r"\b\d{2}\ \d{2}\ \d{2}\b",  # Numéro au format 54 06 54
+]
 
 # Liste d'une partie des sujets valides
 VALID_TOPICS = [
@@ -105,74 +240,332 @@ VALID_TOPICS = [
 # Liste des messages d'introduction ou neutres
 VALID_GREETINGS = ["bonjour", "salut", "hello", "bonsoir", "hey", "oyy", "yo"]
 
+
+def normalize_text(text):
+    """Met un texte en minuscules et sans accents, pour comparer « Révision » et « revision »."""
+    text = unicodedata.normalize("NFD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _alternation(words):
+    # Les mots les plus longs d'abord, pour que « contrôle continu » l'emporte sur un préfixe
+    return "|".join(re.escape(word) for word in sorted({normalize_text(w) for w in words}, key=len, reverse=True))
+
+
+# Scanner unique : informations personnelles, salutation en début de message et sujets valides.
+# Les informations personnelles sont essayées en premier : un sujet écrit à l'intérieur d'un email
+# n'est pas compté, ce qui est sans effet puisque le message est refusé de toute façon.
+SCANNER = re.compile(
+    "(?P<pii>" + "|".join(PII_PATTERNS) + ")"
+    + r"|(?P<greeting>\A(?:" + _alternation(VALID_GREETINGS) + "))"
+    + "|(?P<topic>" + _alternation(VALID_TOPICS) + ")"
+)
+GREETINGS = {normalize_text(greeting) for greeting in VALID_GREETINGS}
+
+
+def scan_message(text):
+    """
+    Analyse un message en un seul parcours du texte normalisé (voir `normalize_text`).
+
+    Args:
+        text (str): Le message de l'utilisateur.
+
+    Returns:
+        dict: Les verdicts "pii" (informations personnelles), "greeting" (commence par
+        une salutation), "greeting_only" (n'est qu'une salutation) et "topic" (mentionne
+        un sujet académique).
+    """
+    normalized = normalize_text(text)
+    verdicts = {"pii": False, "greeting": False, "greeting_only": normalized.strip() in GREETINGS, "topic": False}
+    for match in SCANNER.finditer(normalized):
+        verdicts[match.lastgroup] = True
+        if verdicts["pii"] and verdicts["topic"]:
+            break  # Plus rien à apprendre du reste du message
+    return verdicts
+
+
+# Fonction pour détecter les informations personnelles, y compris les numéros de téléphone d'ici (Nouvelle-Calédonie).
+def contains_personally_identifiable_information(text):
+    return scan_message(text)["pii"]
+
 #Fonction pour vérifier si le sujet de la phrase est valide ou non
-def restrict_to_topic(text):
-    """Valide si le texte contient un sujet académique valide ou une salutation."""
-    # Vérifie les salutations
-    for greeting in VALID_GREETINGS:
-        if text.lower().startswith(greeting):
-            return True
-        
-    #Vérifie les sujets valides
-    for topic in VALID_TOPICS:
-        if topic.lower() in text.lower():  # Vérifie si le sujet est mentionné dans le texte
-            return True
-        
-    return False
+def restrict_to_topic(text, verdicts=None):
+    """Valide si le texte contient un sujet académique valide ou une salutation.
+    `verdicts` est le résultat de `scan_message`, s'il est déjà calculé."""
+    if verdicts is None:
+        verdicts = scan_message(text)
+    return verdicts["greeting"] or verdicts["topic"]
 
 #Fonction pour ajouter une réponse spécifique aux messages d'introduction
-def handle_greetings(user_input):
-    """Gère les salutations pour fournir une réponse personnalisée."""
-    if user_input.lower() in VALID_GREETINGS:
+def handle_greetings(user_input, verdicts=None):
+    """Gère les salutations pour fournir une réponse personnalisée.
+    `verdicts` est le résultat de `scan_message`, s'il est déjà calculé."""
+    if verdicts is None:
+        verdicts = scan_message(user_input)
+    if verdicts["greeting_only"]:
         return "\n\nRéponse du bot : Bonjour ! Comment puis-je vous aider aujourd'hui ? Posez-moi une question sur vos cours, examens, révisions ou organisation universitaire.\n"
     return None
 
-# Fonction principale pour valider un message utilisateur
-def validate_input(user_input):
-    # Étape 1 : Vérification des informations personnelles
-    if contains_personally_identifiable_information(user_input):
-        return {
-            "valid": False,
-            "reason": "Votre message contient des informations personnelles sensibles. Veuillez les retirer."
-        }
+VERDICT_CACHE_MAX_ENTRIES = int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "2048"))
+
+REASON_PII = "Votre message contient des informations personnelles sensibles. Veuillez les retirer."
+REASON_TOPIC = "Votre message semble hors du cadre académique. Veuillez poser une question liée à vos cours, examens, révisions ou organisation universitaire."
+REASON_TOXIC = "Votre message contient un contenu inapproprié ou hors cadre académique. Veuillez reformuler."
+REASON_RELEVANCE = "Votre message semble hors contexte académique. Reformulez votre question pour rester dans ce cadre."
+REASON_ERROR = "Erreur lors de la validation du message."
+VALID = {"valid": True, "reason": ""}
+
+# Cache LRU des verdicts, par empreinte du message exact et de la version du lexique d'insultes
+_verdict_cache = OrderedDict()
+_verdict_cache_lock = threading.Lock()
+
+
+def _lexicon_version():
+    # Le module du validateur n'est pas importé ici : tant que le Guard n'est pas créé, pas de version
+    module = sys.modules.get("french_toxic_language_validator")
+    entry = getattr(module, "_latest_entry", None)
+    return entry["version"] if entry else ""
+
+
+def verdict_key(user_input, lexicon_version=None):
+    """
+    Empreinte d'un message pour le cache des verdicts.
+
+    Le message est pris tel quel : le validateur d'insultes distingue les accents
+    (« encule » et « enculé » n'ont pas la même empreinte). La version du lexique
+    d'insultes en fait partie, pour qu'un lexique rafraîchi invalide les verdicts.
 
+    Args:
+        user_input (str): Le message.
+        lexicon_version (str, optional): La version du lexique ; par défaut, celle en service.
+
+    Returns:
+        str: L'empreinte.
+    """
+    if lexicon_version is None:
+        lexicon_version = _lexicon_version()
+    return hashlib.sha1(f"{lexicon_version}\n{user_input}".encode("utf-8")).hexdigest()
+
+
+def _cached_verdict(key):
+    with _verdict_cache_lock:
+        verdict = _verdict_cache.get(key)
+        if verdict is not None:
+            _verdict_cache.move_to_end(key)
+        return verdict
+
+
+def _cache_verdict(key, verdict):
+    with _verdict_cache_lock:
+        _verdict_cache[key] = verdict
+        _verdict_cache.move_to_end(key)
+        while len(_verdict_cache) > VERDICT_CACHE_MAX_ENTRIES:
+            _verdict_cache.popitem(last=False)
+
+
+# Étapes locales de validation. Chacune retourne la raison du refus, ou None.
+def _check_scan(user_input, verdicts):
+    # Étape 1 : Vérification des informations personnelles
+    if verdicts["pii"]:
+        return REASON_PII
     # Étape 2 : Restriction au sujet académique
-    if not restrict_to_topic(user_input):
-        return {
-            "valid": False,
-            "reason": "Votre message semble hors du cadre académique. Veuillez poser une question liée à vos cours, examens, révisions ou organisation universitaire."
-        }
+    if not restrict_to_topic(user_input, verdicts):
+        return REASON_TOPIC
+    return None
 
+def _check_toxicity(user_input, verdicts):
     # Étape 3 : Validation avec Guardrails en français
-    result_fr = guard_fr.validate(user_input, metadata={'original_prompt': user_input})
-    if not result_fr.validation_passed:
-        return {
-            "valid": False,
-            "reason": "Votre message contient un contenu inapproprié ou hors cadre académique. Veuillez reformuler."
-        }
-
-    # Étape 4 : Validation en anglais pour des contextes multilingues
-    result_en = guard_en.validate(user_input, metadata={'original_prompt': user_input})
-    if not result_en.validation_passed:
-        return {
-            "valid": False,
-            "reason": "Votre message semble hors contexte académique. Reformulez votre question pour rester dans ce cadre."
-        }
-
-    # Si tout est valide
-    return {"valid": True, "reason": ""}
+    try:
+        result_fr = get_guard_fr().validate(user_input, metadata={'original_prompt': user_input})
+    except Exception as e:
+        # Sans lexique d'insultes, le message est refusé ; le validateur est recréé au prochain message
+        logging.error(f"Erreur lors de la détection des insultes: {repr(e)}")
+        return REASON_ERROR
+    return None if result_fr.validation_passed else REASON_TOXIC
+
+LOCAL_STEPS = [("scan", _check_scan), ("toxicité", _check_toxicity)]  # Ordre initial, du moins coûteux au plus coûteux
+_step_costs = {}  # Durée moyenne mesurée de chaque étape (s)
+
+
+def _run_local_steps(user_input, verdicts):
+    # Les étapes les moins coûteuses d'abord (celles pas encore mesurées à la fin, dans
+    # l'ordre de LOCAL_STEPS) : le premier refus arrête la validation
+    for name, step in sorted(LOCAL_STEPS, key=lambda item: _step_costs.get(item[0], float("inf"))):
+        start = time.perf_counter()
+        reason = step(user_input, verdicts)
+        duration = time.perf_counter() - start
+        _step_costs[name] = duration if name not in _step_costs else 0.8 * _step_costs[name] + 0.2 * duration
+        if reason:
+            return {"valid": False, "reason": reason}
+    return VALID
+
+# Étape 4 : Validation en anglais pour des contextes multilingues (aller-retour avec un LLM)
+def check_relevance(user_input):
+    try:
+        result_en = get_guard_en().validate(user_input, metadata={'original_prompt': user_input})
+    except Exception as e:
+        logging.error(f"Erreur lors de la vérification de la pertinence: {repr(e)}")
+        return {"valid": False, "reason": REASON_ERROR}
+    return VALID if result_en.validation_passed else {"valid": False, "reason": REASON_RELEVANCE}
+
+# Fonction principale pour valider un message utilisateur
+def validate_input(user_input, verdicts=None, relevance=True):
+    """
+    Valide un message utilisateur.
+
+    Les étapes locales (scanner, puis validateur d'insultes) sont exécutées par
+    coût mesuré croissant et s'arrêtent au premier refus ; la vérification de
+    pertinence par LLM, la plus coûteuse, vient en dernier. Les verdicts complets
+    sont mis en cache par message et version du lexique (voir `verdict_key`).
+
+    Args:
+        user_input (str): Le message.
+        verdicts (dict, optional): Le résultat de `scan_message`, s'il est déjà calculé.
+        relevance (bool): Si False, seules les étapes locales sont exécutées (voir
+            `generate_moderated_response`, qui vérifie la pertinence pendant la génération).
+
+    Returns:
+        dict: {"valid": bool, "reason": str}.
+    """
+    key = verdict_key(user_input)
+    cached = _cached_verdict(key)
+    if cached is not None:
+        return cached
+
+    if verdicts is None:
+        verdicts = scan_message(user_input)
+    result = _run_local_steps(user_input, verdicts)
+    # Le validateur d'insultes a pu être créé ou passer à un lexique rafraîchi pendant les étapes
+    key = verdict_key(user_input)
+    if not result["valid"]:
+        if result["reason"] != REASON_ERROR:
+            _cache_verdict(key, result)
+        return result
+    if not relevance:
+        return result
+
+    result = check_relevance(user_input)
+    if result["reason"] != REASON_ERROR:
+        _cache_verdict(key, result)
+    return result
+
+# Fonction pour générer une réponse pendant la vérification de pertinence
+def generate_moderated_response(user_input):
+    """
+    Génère la réponse à un message en même temps que sa vérification de pertinence.
+
+    Les étapes locales sont exécutées d'abord. La vérification par LLM est ensuite
+    lancée en parallèle de la génération (en streaming) : si elle refuse le message,
+    la génération est interrompue. La réponse n'est retournée que si le message est validé.
+
+    Args:
+        user_input (str): Le message, non vide.
+
+    Returns:
+        tuple[dict, str | None]: Le verdict et la réponse (None si le message est refusé
+        ou si la génération a échoué).
+    """
+    verdict = validate_input(user_input, relevance=False)
+    if not verdict["valid"]:
+        return verdict, None
+    key = verdict_key(user_input)
+    if _cached_verdict(key) is not None:  # Pertinence déjà vérifiée pour ce message
+        return verdict, generate_response(user_input)
+
+    relevance_thread_result = {}
+    relevance_thread = threading.Thread(
+        target=lambda: relevance_thread_result.update(verdict=check_relevance(user_input)), daemon=True
+    )
+    relevance_thread.start()
+
+    chunks = []
+    stream = None
+    try:
+        stream = get_client().chat.completions.create(
+            messages=[
+                {"role": "system", "content": META_PROMPT},
+                {"role": "user", "content": user_input},
+            ],
+            model="gpt-4o-mini",
+            stream=True,
+        )
+        for chunk in stream:
+            refused = relevance_thread_result.get("verdict")
+            if refused is not None and not refused["valid"]:
+                logging.info("Message refusé pendant la génération, génération interrompue")
+                break
+            if chunk.choices and chunk.choices[0].delta.content:
+                chunks.append(chunk.choices[0].delta.content)
+    except Exception as e:
+        logging.error("Erreur lors de la génération de la réponse : %s", str(e))
+        chunks = None
+    finally:
+        if stream is not None:
+            stream.close()
+
+    relevance_thread.join()
+    verdict = relevance_thread_result["verdict"]
+    if verdict["reason"] != REASON_ERROR:
+        _cache_verdict(key, verdict)
+    if not verdict["valid"] or chunks is None:
+        return verdict, None
+    response = "".join(chunks)
+    logging.info("Réponse générée par le bot : %s", response)
+    return verdict, response
+
+# Fonction pour valider un lot de messages (rejeu ou audit d'historiques de conversation)
+def validate_batch(messages, max_workers=4):
+    """
+    Valide une liste de messages, comme `validate_input`.
+
+    Chaque message distinct n'est validé qu'une fois. Le scanner local est passé
+    sur tous les messages ; seuls ceux qu'il accepte sont envoyés aux validateurs
+    Guardrails, en parallèle.
+
+    Args:
+        messages (list[str]): Les messages à valider.
+        max_workers (int): Nombre de messages validés simultanément par Guardrails.
+
+    Returns:
+        list[dict]: Le résultat de `validate_input` pour chaque message, dans l'ordre.
+    """
+    unique_messages = list(dict.fromkeys(messages))
+    verdicts = {message: scan_message(message) for message in unique_messages}
+    results = {}
+    to_guard = []
+    for message in unique_messages:
+        if verdicts[message]["pii"] or not restrict_to_topic(message, verdicts[message]):
+            results[message] = validate_input(message, verdicts[message])
+        else:
+            to_guard.append(message)
+
+    def validate(message):
+        try:
+            return validate_input(message, verdicts[message])
+        except Exception as e:
+            logging.error(f"Erreur lors de la validation d'un message: {repr(e)}")
+            return {"valid": False, "reason": REASON_ERROR}
+
+    if to_guard:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(to_guard)))) as executor:
+            results.update(zip(to_guard, executor.map(validate, to_guard)))
+    logging.info(f"{len(messages)} message(s) validé(s), dont {len(to_guard)} envoyé(s) à Guardrails")
+    return [results[message] for message in messages]
 
 # Fonction pour modérer l'entrée utilisateur
 def moderated_input():
     user_input = input("\n\nVotre message : ").strip()
+    # Un seul passage du scanner, partagé par les salutations et la validation
+    verdicts = scan_message(user_input)
     
     # Vérifie si le message est une salutation
-    greeting_response = handle_greetings(user_input)
+    greeting_response = handle_greetings(user_input, verdicts)
     if greeting_response:
         print(greeting_response)
         return None  # Ne continue pas vers une validation stricte pour les salutations
     
-    validation_result = validate_input(user_input)
+    # Validation locale uniquement : la pertinence est vérifiée pendant la génération
+    validation_result = validate_input(user_input, verdicts, relevance=False)
 
     if validation_result["valid"]:
         print("Message validé. Traitement en cours...")
@@ -188,13 +581,65 @@ def chatbot_interaction():
         if user_input is None:
             continue  # Si le message est invalidé, redemander un nouveau message
 
-        # Génération de la réponse si le message est validé
-        bot_response = generate_response(user_input)
-        if bot_response:
+        # Génération de la réponse, interrompue si le message est jugé hors contexte
+        validation_result, bot_response = generate_moderated_response(user_input)
+        if not validation_result["valid"]:
+            print(validation_result["reason"])
+        elif bot_response:
             print(f"\n\nRéponse du bot : {bot_response}\n")
         else:
             print("Erreur : Réponse du bot vide. Veuillez réessayer.")
 
+# Tests
+class TestSplitSentences:
+    """Vérifie le découpage des textes longs avant traduction."""
+
+    TEXT = (
+        "Le cours d'algorithmique commence à 8h. Il dure deux heures !\n"
+        "Ensuite, pause… Puis réseaux en salle B204 ?  Oui.\n\n"
+        "Dernière phrase sans ponctuation finale"
+    )
+
+    def test_round_trip(self):
+        """Les morceaux concaténés redonnent exactement le texte, et chacun respecte la taille maximale."""
+        for max_chars in (10, 25, 60, 4500):
+            chunks = split_sentences(self.TEXT, max_chars)
+            assert "".join(chunks) == self.TEXT
+            assert all(0 < len(chunk) <= max_chars for chunk in chunks)
+
+    def test_cut_at_sentence_ends(self):
+        """Les phrases sont regroupées sans être coupées quand elles tiennent dans un morceau."""
+        chunks = split_sentences(self.TEXT, 70)
+        assert chunks[0] == "Le cours d'algorithmique commence à 8h. Il dure deux heures !\n"
+
+    def test_long_sentence_split_at_spaces(self):
+        """Une phrase plus longue que la taille maximale est coupée aux espaces."""
+        sentence = " ".join(["mot"] * 40) + "."
+        chunks = split_sentences(sentence, 30)
+        assert "".join(chunks) == sentence
+        assert all(len(chunk) <= 30 for chunk in chunks)
+        assert all(chunk.endswith(" ") for chunk in chunks[:-1])
+
+    def test_empty(self):
+        assert "".join(split_sentences("")) == ""
+
+class TestVerdictKey:
+    """Vérifie l'empreinte utilisée par le cache des verdicts."""
+
+    def test_exact_text(self):
+        """Un message accentué différemment n'a pas la même empreinte (le lexique distingue les accents)."""
+        assert verdict_key("encule, parlons de mon cours", "v1") != verdict_key("enculé, parlons de mon cours", "v1")
+        assert verdict_key("Mon cours", "v1") != verdict_key("mon  cours", "v1")
+        assert verdict_key("mon cours", "v1") == verdict_key("mon cours", "v1")
+
+    def test_lexicon_version(self, monkeypatch):
+        """Un lexique rafraîchi change l'empreinte, donc invalide les verdicts en cache."""
+        assert verdict_key("mon cours", "v1") != verdict_key("mon cours", "v2")
+        module = type(sys)("french_toxic_language_validator")
+        module._latest_entry = {"version": "v2"}
+        monkeypatch.setitem(sys.modules, "french_toxic_language_validator", module)
+        assert verdict_key("mon cours") == verdict_key("mon cours", "v2")
+
 # Point d'entrée du programme
 if __name__ == "__main__":
     chatbot_interaction()
\ No newline at end of file
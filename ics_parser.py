@@ -0,0 +1,205 @@
+from datetime import datetime, timedelta, timezone
+import re
+
+import pytz
+
+# Seules ces propriétés des VEVENT sont utilisées par scrap_edt
+_WANTED_PROPERTIES = {"DTSTART", "DTEND", "DURATION", "SUMMARY", "DESCRIPTION"}
+_TEXT_ESCAPES = re.compile(r"\\([\\;,nN])")
+_DURATION = re.compile(
+    r"^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$"
+)
+
+
+def _unfold(ics_content):
+    """Reconstitue les lignes logiques d'un contenu ICS (RFC 5545 §3.1 : une ligne
+    commençant par un espace ou une tabulation prolonge la précédente)."""
+    current = None
+    for line in ics_content.splitlines():
+        if line[:1] in (" ", "\t"):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _split_property(line):
+    """Sépare une ligne `NOM;PARAM=valeur:VALEUR` en (nom, paramètres, valeur)."""
+    in_quotes = False
+    for position, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ":" and not in_quotes:
+            head, value = line[:position], line[position + 1:]
+            break
+    else:
+        return None, {}, ""
+    name, *raw_params = head.split(";")
+    params = {}
+    for raw_param in raw_params:
+        key, _, param_value = raw_param.partition("=")
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+
+def _unescape_text(value):
+    return _TEXT_ESCAPES.sub(lambda match: "\n" if match.group(1) in "nN" else match.group(1), value)
+
+
+def _parse_datetime(value, params):
+    """Convertit une valeur DTSTART/DTEND en datetime UTC."""
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        # Événement sur la journée entière : minuit UTC, comme la bibliothèque ics
+        return datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]), tzinfo=timezone.utc)
+    naive = datetime(
+        int(value[0:4]), int(value[4:6]), int(value[6:8]),
+        int(value[9:11]), int(value[11:13]), int(value[13:15] or 0),
+    )
+    if value.endswith("Z"):
+        return naive.replace(tzinfo=timezone.utc)
+    tzid = params.get("TZID")
+    if tzid:
+        try:
+            return pytz.timezone(tzid).localize(naive).astimezone(timezone.utc)
+        except pytz.UnknownTimeZoneError:
+            pass
+    # Heure « flottante » : considérée comme UTC
+    return naive.replace(tzinfo=timezone.utc)
+
+
+def _parse_duration(value):
+    match = _DURATION.match(value.strip())
+    if not match:
+        return None
+    parts = {key: int(number) for key, number in match.groupdict().items() if key != "sign" and number}
+    duration = timedelta(**parts)
+    return -duration if match.group("sign") == "-" else duration
+
+
+def _build_event(properties, tz):
+    start_value = properties.get("DTSTART")
+    if start_value is None:
+        return None
+    begin = _parse_datetime(*start_value)
+    if "DTEND" in properties:
+        end = _parse_datetime(*properties["DTEND"])
+    elif "DURATION" in properties and _parse_duration(properties["DURATION"][0]) is not None:
+        end = begin + _parse_duration(properties["DURATION"][0])
+    elif len(start_value[0]) == 8:
+        end = begin + timedelta(days=1)
+    else:
+        end = begin
+    return {
+        "begin": begin.astimezone(tz),
+        "end": end.astimezone(tz),
+        "name": _unescape_text(properties["SUMMARY"][0]) if "SUMMARY" in properties else "",
+        "description": _unescape_text(properties["DESCRIPTION"][0]) if "DESCRIPTION" in properties else "",
+    }
+
+
+def iter_events(ics_content, tz=pytz.timezone("Pacific/Noumea")):
+    """Parcourt un contenu ICS et produit ses événements au fur et à mesure.
+
+    Seuls le début, la fin, le nom et la description de chaque VEVENT sont extraits ;
+    les autres propriétés et les composants imbriqués (VALARM...) sont ignorés.
+
+    Args:
+        ics_content (str): Le contenu ICS.
+        tz (tzinfo): Le fuseau horaire dans lequel convertir les dates.
+
+    Yields:
+        Dict: Un événement avec les clés "begin" et "end" (datetime dans `tz`),
+        "name" et "description" (str).
+    """
+    properties = None
+    depth = 0  # Profondeur des composants imbriqués dans le VEVENT courant
+    for line in _unfold(ics_content):
+        if properties is None:
+            if line.upper() == "BEGIN:VEVENT":
+                properties = {}
+                depth = 0
+            continue
+        upper = line.upper()
+        if upper.startswith("BEGIN:"):
+            depth += 1
+        elif upper.startswith("END:"):
+            if depth:
+                depth -= 1
+            elif upper == "END:VEVENT":
+                event = _build_event(properties, tz)
+                if event is not None:
+                    yield event
+                properties = None
+        elif depth == 0:
+            name, params, value = _split_property(line)
+            if name in _WANTED_PROPERTIES:
+                properties[name] = (value, params)
+
+
+# Tests
+class TestIcsParser:
+    """Vérifie que iter_events produit les mêmes événements que la bibliothèque ics."""
+
+    SAMPLE = "\r\n".join([
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//test//EN",
+        "BEGIN:VEVENT",
+        "UID:1@test",
+        "DTSTAMP:20240101T000000Z",
+        "DTSTART:20240304T200000Z",
+        "DTEND:20240304T220000Z",
+        "SUMMARY:Algorithmique (TD Groupe 1)",
+        "DESCRIPTION:Algorithmique (L2)\\nJean Dupont\\, MCF\\nSalle ",
+        " B204",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "UID:2@test",
+        "DTSTAMP:20240101T000000Z",
+        "DTSTART;TZID=Pacific/Noumea:20240305T080000",
+        "DURATION:PT1H30M",
+        "SUMMARY:Réseaux (CM)",
+        "BEGIN:VALARM",
+        "ACTION:DISPLAY",
+        "DESCRIPTION:Rappel",
+        "TRIGGER:-PT15M",
+        "END:VALARM",
+        "END:VEVENT",
+        "END:VCALENDAR",
+        "",
+    ])
+
+    def _reference(self):
+        from ics import Calendar
+        tz = pytz.timezone("Pacific/Noumea")
+        return sorted(
+            (
+                event.begin.astimezone(tz), event.end.astimezone(tz),
+                event.name or "", event.description or "",
+            )
+            for event in Calendar(self.SAMPLE).events
+        )
+
+    def test_equivalence_with_ics(self):
+        """Les champs extraits sont identiques à ceux de ics.Calendar."""
+        parsed = sorted(
+            (event["begin"], event["end"], event["name"], event["description"])
+            for event in iter_events(self.SAMPLE)
+        )
+        assert parsed == self._reference()
+
+    def test_local_formatting(self):
+        """Les dates formatées comme dans scrap_edt sont dans le fuseau de Nouméa."""
+        first = next(iter_events(self.SAMPLE))
+        assert first["begin"].strftime('%Y-%m-%d %H:%M') == "2024-03-05 07:00"
+        assert first["description"] == "Algorithmique (L2)\nJean Dupont, MCF\nSalle B204"
+
+    def test_lazy(self):
+        """Les événements sont produits un par un, sans analyser tout le calendrier."""
+        events = iter_events(self.SAMPLE)
+        assert next(events)["name"] == "Algorithmique (TD Groupe 1)"
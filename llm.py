@@ -0,0 +1,135 @@
+from collections import OrderedDict
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+
+CHAT_MODEL = "gpt-4o-mini"
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # Durée de vie d'une réponse en cache (s)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+
+_chat_model = None
+_chat_model_lock = threading.Lock()
+
+
+def get_chat_model():
+    """
+    Retourne le client de chat partagé par tout le processus.
+
+    Le client est créé au premier appel puis réutilisé : ses connexions HTTP
+    restent ouvertes d'une question à l'autre.
+
+    Returns:
+        ChatOpenAI: Le modèle de chat.
+    """
+    global _chat_model
+    with _chat_model_lock:
+        if _chat_model is None:
+            from langchain_openai import ChatOpenAI  # Import coûteux, fait au premier usage
+            _chat_model = ChatOpenAI(model_name=CHAT_MODEL)
+            logging.info("Modèle de chat initialisé")
+        return _chat_model
+
+
+def normalize_question(text):
+    """Met une question sous une forme canonique : minuscules, sans accents ni ponctuation finale, espaces réduits."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text).strip(" ?!.")
+
+
+class ResponseCache:
+    """Cache LRU des réponses du modèle, avec durée de vie.
+
+    Les clés sont de la forme (question normalisée, utilisateur, fenêtre de dates,
+    version de l'emploi du temps). Quand une réponse est enregistrée pour une
+    nouvelle version de l'emploi du temps d'un utilisateur, ses réponses
+    calculées sur les versions précédentes sont supprimées.
+
+    Une réponse qui concerne plusieurs utilisateurs (réunion) a pour utilisateur le
+    tuple de leurs identifiants et pour version le tuple de leurs versions :
+    `invalidate_user` la supprime pour chacun des participants.
+    """
+
+    def __init__(self, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # clé -> (expiration, réponse)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(question, user_id, list_of_dates, version):
+        return (normalize_question(question), user_id, tuple(list_of_dates), version)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def put(self, key, response):
+        _, user_id, _, version = key
+        with self._lock:
+            # Les réponses calculées sur une ancienne version de l'emploi du temps ne servent plus
+            for stale_key in [k for k in self._entries if k[1] == user_id and k[3] != version]:
+                del self._entries[stale_key]
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _participants(key):
+        return key[1] if isinstance(key[1], tuple) else (key[1],)
+
+    def invalidate_user(self, user_id):
+        """Supprime les réponses qui concernent un utilisateur, seul ou parmi d'autres."""
+        with self._lock:
+            for key in [k for k in self._entries if user_id in self._participants(k)]:
+                del self._entries[key]
+
+
+response_cache = ResponseCache()
+
+
+def stream_chat(chat_model, messages, on_complete=None):
+    """
+    Génère la réponse du modèle de chat morceau par morceau.
+
+    Fermer le générateur (par exemple quand Streamlit interrompt le script parce
+    que l'utilisateur a quitté la page) ferme aussi le flux de la requête en cours.
+
+    Args:
+        chat_model (BaseChatModel): Le modèle de chat Langchain.
+        messages (list[BaseMessage]): Les messages envoyés au modèle.
+        on_complete (Callable[[str], None], optional): Appelée avec la réponse complète,
+            uniquement si elle a été reçue en entier sans erreur.
+
+    Yields:
+        str: Les morceaux de texte de la réponse.
+    """
+    stream = chat_model.stream(messages)
+    chunks = []
+    try:
+        for chunk in stream:
+            if chunk.content:
+                chunks.append(chunk.content)
+                yield chunk.content
+        if on_complete is not None:
+            on_complete("".join(chunks))
+    except GeneratorExit:
+        logging.info("Génération de la réponse interrompue")
+        raise
+    except Exception as e:
+        logging.error(f"Erreur lors de la génération de la réponse: {repr(e)}")
+        yield "Erreur lors de la génération de la réponse."
+    finally:
+        stream.close()
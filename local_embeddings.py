@@ -0,0 +1,47 @@
+import hashlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class HashingEmbeddings(Embeddings):
+    """Embeddings locaux et déterministes, basés sur le hachage de n-grammes de caractères.
+
+    Aucun appel réseau : chaque n-gramme du texte (en minuscules) est haché vers
+    une des `dimension` composantes du vecteur, avec un signe lui aussi tiré du
+    hash, puis le vecteur est normalisé. Deux textes proches partagent beaucoup
+    de n-grammes et ont donc des vecteurs proches. Sert aux benchmarks et aux
+    exécutions sans accès à l'API OpenAI.
+    """
+
+    def __init__(self, dimension=384, ngram_range=(3, 5)):
+        """
+        Args:
+            dimension (int): La dimension des vecteurs produits.
+            ngram_range (tuple[int, int]): Les tailles minimale et maximale des n-grammes.
+        """
+        self._dimension = dimension
+        self.ngram_range = ngram_range
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self._dimension, dtype="float32")
+        text = f" {text.lower()} "
+        min_n, max_n = self.ngram_range
+        for n in range(min_n, max_n + 1):
+            for start in range(max(len(text) - n + 1, 0)):
+                digest = hashlib.blake2b(text[start:start + n].encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                vector[value % self._dimension] += 1.0 if (value >> 63) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+    def dimension(self) -> int:
+        return self._dimension
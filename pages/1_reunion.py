@@ -2,15 +2,16 @@ import locale
 import shutil
 import pytz
 import streamlit as st
-from langchain_openai import ChatOpenAI
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 import streamlit as st
 import os
 import logging
 from dotenv import load_dotenv
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage, SystemMessage
-from tools import fetch_and_concatenate_documents, load_and_save_to_faiss_json, remove_data
+from free_slots import common_free_slots
+from llm import ResponseCache, get_chat_model, response_cache, stream_chat
+from tools import fetch_event_stores
 
 
 load_dotenv()
@@ -58,83 +59,100 @@ Ton rôle est d'offrir des conseils précis sur la gestion du temps.
 
 
 PROMPT_TEMPLATE_REUNION="""
-Vous avez les emplois du temps de deux étudiants détaillant leurs cours et leurs horaires. Ils souhaitent planifier des réunions communes entre le {start_date} et le {end_date}.
-
-#### **Données des étudiants :**
-
-- **Etudiant 1 :**  
-{edt1}
-
-- **Etudiant 2 :**  
-{edt2}
-
-#### **Objectif :**
-Identifier des créneaux de réunion où les deux étudiants sont disponibles en dehors de leurs cours, en respectant les contraintes suivantes :
-1. **Durée des créneaux :** Chaque créneau doit **toujours** durer entre 1 heure et 2 heures .  
-2. **Non-chevauchement :** Les créneaux proposés ne doivent pas empiéter sur les horaires des cours.  
-3. **Période de la journée :** Les créneaux doivent être situés entre 07:00 et 18:00. Aucun créneau ne doit être proposé en dehors de cette plage horaire.  
-4. **Optimisation :** Maximiser les périodes communes disponibles pour faciliter la réunion.
-
-#### **Méthodologie :**
-1. **Assomption par défaut :** Si rien dans le contexte n'est précisé concernant une horraire, considérer que l'Etudiant est entièrement disponible sur la plage horaire définie (08:00 à 18:00).  
-2. **Fusion des disponibilités :** Identifier les périodes communes en croisant les plages horaires libres des deux étudiants. Par exemple, si :
-   - Etudiant 1 est libre de 10h00 à 14h00
-   - Etudiant 2 est libre de 11h00 à 15h00  
-   Le créneau commun serait de 11h00 à 14h00.  
-3. **Organisation par jour :** Proposer les créneaux , en respectant la durée minimale et maximale des réunions.  
-4. **Respect des horaires :** Limiter les suggestions aux heures comprises entre 08:00 et 18:00. Ignorer toute disponibilité en dehors de cette plage horaire.  
-5. **Visualisation claire :** Fournir un tableau ou une liste structurée des disponibilités communes, triées par jour.
-
-#### **Résultat attendu :**
-Un tableau clair et structuré des créneaux disponibles respectant la duré de 1 heure à 2heures maximum, organisé et qui facilite la sélection des meilleurs moments pour une réunion.
+Les étudiants {participants} souhaitent planifier des réunions communes entre le {start_date} et le {end_date}.
+
+Les créneaux où ils sont tous disponibles ont déjà été calculés à partir de leurs emplois du temps :
+
+{creneaux}
+
+Présente ces créneaux dans un tableau clair, trié par jour. N'ajoute, ne supprime et ne modifie aucun créneau.
 """
 
 
+def format_slots(slots):
+    """Rend les créneaux sous forme de lignes compactes pour le prompt."""
+    return "\n".join(f"{slot['date']} | {slot['début']}-{slot['fin']} | {slot['durée']}" for slot in slots)
+
+
+def generate_planning(user_ids, list_of_dates, day_start=time(7), day_end=time(18),
+                      min_duration=timedelta(hours=1), max_duration=timedelta(hours=2), mise_en_forme=False):
+    """
+    Calcule les créneaux de réunion communs à plusieurs étudiants.
+
+    Les disponibilités sont calculées directement à partir des emplois du temps ;
+    le modèle de langage ne sert, si demandé, qu'à mettre en forme le résultat.
+
+    Args:
+        user_ids (list[str]): Les identifiants des participants.
+        list_of_dates (list[str]): Les dates ISO de la période de recherche.
+        day_start (time): Heure de début de la plage de travail.
+        day_end (time): Heure de fin de la plage de travail.
+        min_duration (timedelta): Durée minimale d'un créneau.
+        max_duration (timedelta): Durée maximale d'un créneau.
+        mise_en_forme (bool): Si True, le tableau est mis en forme par gpt-4o-mini.
+
+    Returns:
+        tuple[list[dict] | None, Iterator[str] | None]: Les créneaux communs (None si
+        l'emploi du temps d'un participant est indisponible) et, éventuellement, le
+        flux de la réponse mise en forme, à afficher avec `st.write_stream`.
+    """
+    st.write(f"Récupération des emplois du temps de {', '.join(user_ids)} ...")
+    stores, errors = fetch_event_stores(user_ids)
+    if errors:
+        # Sans l'emploi du temps de chacun, un créneau ne peut pas être présenté comme commun
+        for user_id, error in errors.items():
+            st.error(f"Emploi du temps de {user_id} indisponible : {error}")
+        status.update(label="Planning impossible à générer", state="error", expanded=True)
+        return None, None
+
+    st.write("Calcul des créneaux communs ...")
+    slots = common_free_slots(
+        list(stores.values()), list_of_dates,
+        day_start=day_start, day_end=day_end,
+        min_duration=min_duration, max_duration=max_duration,
+    )
+    logging.info(f"{len(slots)} créneaux communs trouvés pour {user_ids}")
+
+    if not mise_en_forme or not slots:
+        status.update(label="Planning généré !", state="complete", expanded=False)
+        return slots, None
+
+    creneaux = format_slots(slots)
+    # Les participants et leurs versions : `invalidate_user` atteint la réponse par chacun d'eux
+    cache_key = ResponseCache.key(
+        creneaux, tuple(sorted(stores)), list_of_dates, tuple(stores[user_id].version for user_id in sorted(stores))
+    )
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        logging.info("Réponse servie depuis le cache")
+        status.update(label="Planning généré !", state="complete", expanded=False)
+        return slots, iter([cached])
 
-def generate_planning_for_2(querry_text,main_user,second_user,list_of_dates):
     try:
-        # Utilisez model_name au lieu de model
-        chat_model = ChatOpenAI(model_name="gpt-4o-mini")
-        logging.info(f"Modèle initialisé")
+        # Client partagé : les connexions sont réutilisées d'une requête à l'autre
+        chat_model = get_chat_model()
     except Exception as e:
         logging.error(f"Erreur lors de l'initialisation du modèle : {repr(e)}")
-        return "Erreur lors de l'initialisation du modèle."
-
-    #On supprime parce que j'arrive pas trop à gérer les doublons for now
-    st.write("Génération des fichiers ...")
-
-    remove_data("faiss_data")
-    #Création données pour les deux étudiants avec l'embeding et tout le tralala
-    st.write(f"Génération pour {main_user}")
-    load_and_save_to_faiss_json(main_user)
-    st.write(f"Génération pour {second_user}")
-    load_and_save_to_faiss_json(second_user)
-
-    st.write("Création du contexte ...")
-    #On récupère les données et on les manipules pour récupérer tout en une chaine de caractere 
-    context_main_user=fetch_and_concatenate_documents(querry_text,list_of_dates,main_user)
-    context_second_user=fetch_and_concatenate_documents(querry_text,list_of_dates,second_user)
-    
+        return slots, iter(["Erreur lors de l'initialisation du modèle."])
+
     # Crée le prompt à partir du template
     prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE_REUNION)
-    prompt = prompt_template.format(edt1=context_main_user,edt2=context_second_user,start_date=list_of_dates[0],end_date=list_of_dates[len(list_of_dates)-1])
-    
+    prompt = prompt_template.format(
+        participants=", ".join(stores.keys()),
+        creneaux=creneaux,
+        start_date=list_of_dates[0],
+        end_date=list_of_dates[len(list_of_dates)-1],
+    )
+
     # Ajoute le message système pour guider le comportement de l'IA
     messages = [
         SystemMessage(content=SYSTEM_PROMPT),
         HumanMessage(content=prompt)
     ]
     logging.info(f"Message envoyé à l'IA:\n {messages}")
-    # Utilise le modèle de chat pour générer la réponse
-    st.write("Génération de la réponse")
-    try:
-        st.write(messages[1])
-        response = chat_model(messages=messages)
-        status.update(label="Download complete!", state="complete", expanded=False )
-        return response.content  # Renvoie le contenu de la réponse générée
-    except Exception as e:
-        logging.error(f"Erreur lors de la génération de la réponse: {repr(e)}")
-        return "Erreur lors de la génération de la réponse."
+    # Utilise le modèle de chat pour mettre en forme la réponse, affichée au fur et à mesure
+    status.update(label="Planning généré !", state="complete", expanded=False)
+    return slots, stream_chat(chat_model, messages, on_complete=lambda response: response_cache.put(cache_key, response))
 
 st.set_page_config(page_title="Réunion", page_icon="📅")
 
@@ -145,8 +163,8 @@ st.write(
 
 
 
-user_id1 = st.text_input("Entrez votre identifiant: ", "rcastelain")
-user_id2 = st.text_input("Entrez deuxième identifiant: ", "htiaiba")
+participants = st.text_input("Entrez les identifiants des participants (séparés par des virgules) : ", "rcastelain, htiaiba")
+user_ids = [user_id.strip() for user_id in participants.split(",") if user_id.strip()]
 # Sélection des dates
 date_debut = st.date_input("Sélectionner la date de début pour la réunion :")
 #Pour l'instant on met pas vu qu'on a plus de cours
@@ -156,6 +174,14 @@ date_fin_max = date_debut + timedelta(weeks=2)
 
 date_fin = st.date_input("Sélectionner la date de fin :", min_value=date_debut, max_value=date_fin_max)
 
+# Contraintes des créneaux
+heure_debut, heure_fin = st.slider(
+    "Plage horaire des réunions :",
+    min_value=time(6), max_value=time(21), value=(time(7), time(18)), step=timedelta(minutes=30),
+)
+duree_min, duree_max = st.slider("Durée des créneaux (en heures) :", 0.5, 4.0, (1.0, 2.0), step=0.5)
+mise_en_forme = st.checkbox("Mettre en forme la réponse avec l'IA")
+
 # Générer une liste de dates entre date_debut et date_fin pour les utiliser dans la recherche
 if date_fin >= date_debut:
     liste_dates = [
@@ -165,11 +191,27 @@ if date_fin >= date_debut:
     
 # Bouton pour valider les entrées
 if st.button("Création du planning"):
-    # Appel de la fonction avec les entrées
-    with st.status("Génération de la réponse...", expanded=True) as status:
-        resultat = generate_planning_for_2(f"Cours entre date_debut : {date_debut}  date_fin : {date_fin}",user_id1, user_id2, liste_dates)
-
-    # Affichage du résultat
-    st.write(resultat)
-
-
+    if not user_ids:
+        st.warning("Veuillez entrer au moins un identifiant.")
+    else:
+        # Appel de la fonction avec les entrées
+        with st.status("Génération de la réponse...", expanded=True) as status:
+            creneaux, resultat = generate_planning(
+                user_ids, liste_dates,
+                day_start=heure_debut, day_end=heure_fin,
+                min_duration=timedelta(hours=duree_min), max_duration=timedelta(hours=duree_max),
+                mise_en_forme=mise_en_forme,
+            )
+
+        # Affichage du résultat
+        if resultat:
+            try:
+                st.write_stream(resultat)
+            finally:
+                # Si Streamlit interrompt le script (l'utilisateur quitte la page), la requête est fermée
+                if hasattr(resultat, "close"):
+                    resultat.close()
+        elif creneaux:
+            st.table(creneaux)
+        elif creneaux is not None:
+            st.info("Aucun créneau commun sur cette période.")
@@ -0,0 +1,114 @@
+"""Rafraîchit en tâche de fond les emplois du temps et les index FAISS d'une liste d'étudiants.
+
+Chaque étudiant est re-synchronisé (scrap_edt -> json_to_documents -> save_to_faiss)
+environ toutes les `--interval` secondes, avec une variation aléatoire de ±`--jitter`
+pour étaler les requêtes vers le serveur d'emplois du temps. Ainsi, quand un
+étudiant clique sur « Valider », ses données sont presque toujours déjà prêtes.
+
+Usage :
+    python refresher.py --roster roster.txt --interval 3600 --workers 4
+    python refresher.py --users rcastelain htiaiba --once
+"""
+import argparse
+import heapq
+import logging
+import random
+import time
+
+from tools import load_and_save_to_faiss_json_batch
+
+
+def read_roster(path):
+    """
+    Lit un fichier d'identifiants (un par ligne, lignes vides et commentaires # ignorés).
+
+    Args:
+        path (str): Le chemin du fichier.
+
+    Returns:
+        list[str]: Les identifiants, sans doublons.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        user_ids = [line.split("#")[0].strip() for line in file]
+    return list(dict.fromkeys(user_id for user_id in user_ids if user_id))
+
+
+def jittered(interval, jitter):
+    """Retourne `interval` modifié aléatoirement de ±`jitter` (fraction de l'intervalle)."""
+    return interval * (1 + random.uniform(-jitter, jitter))
+
+
+def refresh_once(user_ids, workers):
+    """
+    Re-synchronise une fois les utilisateurs donnés.
+
+    Returns:
+        dict: Pour chaque utilisateur, None si tout s'est bien passé, sinon l'exception levée.
+    """
+    start = time.monotonic()
+    errors = load_and_save_to_faiss_json_batch(user_ids, max_workers=workers)
+    failed = [user_id for user_id, error in errors.items() if error is not None]
+    logging.info(
+        f"Rafraîchissement de {len(user_ids)} utilisateur(s) en {time.monotonic() - start:.1f}s"
+        + (f", échecs : {', '.join(failed)}" if failed else "")
+    )
+    return errors
+
+
+def run(user_ids, interval, jitter, workers):
+    """
+    Boucle de rafraîchissement : chaque utilisateur a sa propre échéance.
+
+    Les premières échéances sont réparties sur un intervalle pour éviter de
+    solliciter le serveur pour tout le monde au démarrage.
+    """
+    now = time.monotonic()
+    schedule = [(now + random.uniform(0, interval), user_id) for user_id in user_ids]
+    heapq.heapify(schedule)
+    while schedule:
+        due_at = schedule[0][0]
+        delay = due_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        now = time.monotonic()
+        due = []
+        while schedule and schedule[0][0] <= now:
+            due.append(heapq.heappop(schedule)[1])
+        refresh_once(due, workers)
+        for user_id in due:
+            heapq.heappush(schedule, (time.monotonic() + jittered(interval, jitter), user_id))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--roster", help="Fichier contenant un identifiant par ligne")
+    parser.add_argument("--users", nargs="*", default=[], help="Identifiants à rafraîchir")
+    parser.add_argument("--interval", type=float, default=3600, help="Intervalle moyen entre deux rafraîchissements (s)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Variation aléatoire de l'intervalle (fraction, ex: 0.2)")
+    parser.add_argument("--workers", type=int, default=4, help="Nombre d'utilisateurs synchronisés simultanément")
+    parser.add_argument("--once", action="store_true", help="Rafraîchit tout le monde une seule fois puis s'arrête")
+    args = parser.parse_args()
+
+    user_ids = list(args.users)
+    if args.roster:
+        user_ids += read_roster(args.roster)
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        parser.error("aucun identifiant : utilisez --roster ou --users")
+    if not 0 <= args.jitter < 1:
+        parser.error("--jitter doit être compris entre 0 et 1")
+
+    if args.once:
+        errors = refresh_once(user_ids, args.workers)
+        raise SystemExit(1 if any(error is not None for error in errors.values()) else 0)
+
+    logging.info(f"Rafraîchissement de {len(user_ids)} utilisateur(s) toutes les ~{args.interval:.0f}s")
+    try:
+        run(user_ids, args.interval, args.jitter, args.workers)
+    except KeyboardInterrupt:
+        logging.info("Arrêt du rafraîchissement")
+
+
+if __name__ == "__main__":
+    main()
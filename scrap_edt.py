@@ -1,16 +1,241 @@
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+import hashlib
+import logging
 import os
-import openai
+import threading
 import requests
-from ics import Calendar
+from requests.adapters import HTTPAdapter
+from ics_parser import iter_events
+from event_store import EventStore
 import pytz
 from dotenv import load_dotenv
 import json
 
 load_dotenv()
 
+###################VARIABLES###################
+ICS_URL = "http://applis.univ-nc.nc/cgi-bin/WebObjects/EdtWeb.woa/2/wa/default?login={user_id}%2Fical"
+ICS_CACHE_PATH = "ics_cache"
+JSON_PATH = "json_schedules"
+ICS_TIMEOUT = (5, 30)  # (connexion, lecture) en secondes
+EDT_CACHE_MAX_ENTRIES = int(os.getenv("EDT_CACHE_MAX_ENTRIES", "64"))  # Nombre d'utilisateurs gardés en mémoire
+LOCAL_TZ = pytz.timezone("Pacific/Noumea")
+##############################################
+
+# Session HTTP partagée : connexions keep-alive réutilisées d'une requête à l'autre
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=32))
+_session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=32))
+
+# Caches LRU de EDT_CACHE_MAX_ENTRIES entrées chacun, protégés par le même verrou :
+# EDT déjà récupérés : user_id -> {"content_hash", "events", "store"}
+_edt_cache = OrderedDict()
+_edt_cache_lock = threading.Lock()
+# EventStore lus sur disque : chemin -> (mtime, EventStore)
+_store_file_cache = OrderedDict()
+
+
+def _cache_get(cache, key):
+    with _edt_cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _cache_put(cache, key, value):
+    with _edt_cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > EDT_CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+
+
+def _cache_files(user_id):
+    safe_user_id = "".join(c if c.isalnum() or c in "._-" else "_" for c in str(user_id))
+    base = os.path.join(ICS_CACHE_PATH, safe_user_id)
+    return f"{base}.ics", f"{base}.meta.json"
+
+
+def _write_atomic(path, content):
+    """Écrit un fichier texte dans un fichier temporaire puis le renomme (os.replace) :
+    un lecteur concurrent voit l'ancien ou le nouveau contenu, jamais un fichier tronqué."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def fetch_ics(user_id):
+    """Télécharge le calendrier ICS d'un utilisateur, avec revalidation conditionnelle.
+
+    La requête passe par une session HTTP partagée (keep-alive) avec des timeouts.
+    Si une copie locale existe, elle est revalidée avec ETag / If-Modified-Since :
+    une réponse 304 renvoie directement la copie locale.
+
+    Args:
+        user_id (str): L'identifiant de l'utilisateur.
+
+    Raises:
+        Exception: Si la requête échoue ou si l'identifiant est invalide.
+
+    Returns:
+        str: Le contenu ICS.
+    """
+    ics_file, meta_file = _cache_files(user_id)
+    headers = {}
+    if os.path.exists(ics_file) and os.path.exists(meta_file):
+        with open(meta_file, "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = _session.get(ICS_URL.format(user_id=user_id), headers=headers, timeout=ICS_TIMEOUT)
+    except requests.RequestException as e:
+        if os.path.exists(ics_file):
+            logging.warning(f"Serveur d'EDT injoignable, utilisation de la copie locale pour {user_id}: {repr(e)}")
+            with open(ics_file, "r", encoding="utf-8", newline="") as file:
+                return file.read()
+        raise Exception("Impossible de joindre le serveur d'emploi du temps 🚫") from e
+
+    if response.status_code == 304:
+        logging.info(f"EDT de {user_id} inchangé (304), copie locale réutilisée")
+        # newline="" : les fins de ligne CRLF de l'ICS sont relues telles quelles, l'empreinte du contenu ne change pas
+        with open(ics_file, "r", encoding="utf-8", newline="") as file:
+            return file.read()
+
+    # S'assurer de l'encodage UTF-8
+    response.encoding = "UTF-8"
+
+    if not response.ok:
+        raise Exception("Veuillez entrer un identifiant valide 🚫")
+
+    ics_content = response.text
+    if not os.path.exists(ICS_CACHE_PATH):
+        os.makedirs(ICS_CACHE_PATH)
+    # Le refresher et Streamlit peuvent écrire le même utilisateur en même temps
+    _write_atomic(ics_file, ics_content)
+    _write_atomic(meta_file, json.dumps({
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }))
+    return ics_content
+
+
+def parse_events(ics_content):
+    """Extrait les événements d'un contenu ICS, convertis dans le fuseau de Nouméa.
+
+    Args:
+        ics_content (str): Le contenu ICS.
+
+    Returns:
+        List[Dict]: Une liste de dictionnaires avec les clés "begin" et "end"
+        (datetime locales), "name" et "description" (str).
+    """
+    return list(iter_events(ics_content, LOCAL_TZ))
+
+
+def get_events(user_id):
+    """Récupère les événements d'un utilisateur, représentation commune à toutes les vues de l'EDT.
+
+    Chaque appel revalide le calendrier auprès du serveur (requête conditionnelle,
+    voir `fetch_ics`) : un calendrier dont le contenu n'a pas changé n'est pas
+    ré-analysé.
+
+    Args:
+        user_id (str): L'identifiant de l'utilisateur.
+
+    Raises:
+        Exception: Si la requête échoue ou si l'identifiant est invalide.
+
+    Returns:
+        List[Dict]: Les événements renvoyés par `parse_events`.
+    """
+    cached = _cache_get(_edt_cache, user_id)
+    ics_content = fetch_ics(user_id)
+    content_hash = hashlib.sha1(ics_content.encode("utf-8")).hexdigest()
+    if cached and cached["content_hash"] == content_hash:
+        events = cached["events"]
+        store = cached["store"]
+    else:
+        events = parse_events(ics_content)
+        store = None
+
+    _cache_put(_edt_cache, user_id, {"content_hash": content_hash, "events": events, "store": store})
+    return events
+
+
+def get_event_store(user_id):
+    """Récupère l'emploi du temps d'un utilisateur sous forme d'EventStore en colonnes.
+
+    Le store est construit une seule fois par version du calendrier.
+
+    Args:
+        user_id (str): L'identifiant de l'utilisateur.
+
+    Raises:
+        Exception: Si la requête échoue ou si l'identifiant est invalide.
+
+    Returns:
+        EventStore: Les événements de l'utilisateur, triés par date de début.
+    """
+    return _event_store(user_id, get_events(user_id))
+
+
+def _event_store(user_id, events):
+    # Le store des événements déjà récupérés, construit une fois par version du calendrier
+    cached = _cache_get(_edt_cache, user_id)
+    if cached is not None and cached["events"] is events and cached["store"] is not None:
+        return cached["store"]
+    store = EventStore.from_events(events)
+    with _edt_cache_lock:
+        cached = _edt_cache.get(user_id)
+        if cached is not None and cached["events"] is events:
+            cached["store"] = store
+    return store
+
+
+def event_store_path(user_id):
+    return os.path.join(JSON_PATH, f"{user_id}_edt.npz")
+
+
+def schedule_version(user_id):
+    """Retourne l'empreinte de l'emploi du temps enregistré d'un utilisateur (None s'il n'y en a pas)."""
+    store = load_event_store(user_id)
+    return store.version if store is not None else None
+
+
+def load_event_store(user_id):
+    """Charge l'EventStore sauvegardé d'un utilisateur, sans requête réseau.
+
+    Le fichier n'est relu que s'il a été modifié depuis le dernier chargement.
+
+    Args:
+        user_id (str): L'identifiant de l'utilisateur.
+
+    Returns:
+        EventStore | None: Le store, ou None s'il n'a jamais été sauvegardé.
+    """
+    path = event_store_path(user_id)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _cache_get(_store_file_cache, path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    store = EventStore.load(path)
+    _cache_put(_store_file_cache, path, (mtime, store))
+    return store
 
-openai.api_key = os.getenv("OPENAI_KEY")
 
 # Fonction pour récupérer l'EDT depuis l'URL ICS
 def get_edt(user_id):
@@ -35,28 +260,14 @@ def get_edt(user_id):
             - "description": La description du cours (str).
     """
   
-    ics_url = f"http://applis.univ-nc.nc/cgi-bin/WebObjects/EdtWeb.woa/2/wa/default?login={user_id}%2Fical"
-    response = requests.get(ics_url)
-
-    # S'assurer de l'encodage UTF-8
-    response.encoding = "UTF-8"
-    
-    if response.ok:
-        ics_content = response.text
-    else:
-        raise Exception("Veuillez entrer un identifiant valide 🚫")
-
-    cal = Calendar(ics_content)
     cours = []
 
-    local_tz = pytz.timezone("Pacific/Noumea")
+    for event in get_events(user_id):
+        start_local = event["begin"].strftime('%Y-%m-%d %H:%M')
+        end_local = event["end"].strftime('%Y-%m-%d %H:%M')
 
-    for event in cal.events:
-        start_local = event.begin.astimezone(local_tz).strftime('%Y-%m-%d %H:%M')
-        end_local = event.end.astimezone(local_tz).strftime('%Y-%m-%d %H:%M')
-
-        description_coupee = event.description.split('(')[0].strip() #réduire le nom du cours pour l'utilisation dans le chatbot
-        nom_coupee = event.name.split('(')[0].strip() #réduire le nom du cours pour l'utilisation dans le chatbot
+        description_coupee = event["description"].split('(')[0].strip() #réduire le nom du cours pour l'utilisation dans le chatbot
+        nom_coupee = event["name"].split('(')[0].strip() #réduire le nom du cours pour l'utilisation dans le chatbot
         cours.append({
             "nom_cours": nom_coupee,
             "début": start_local,
@@ -86,31 +297,17 @@ def get_edt_semaine(user_id):
             - "description": La description du cours (str).
     """
   
-    ics_url = f"http://applis.univ-nc.nc/cgi-bin/WebObjects/EdtWeb.woa/2/wa/default?login={user_id}%2Fical"
-    response = requests.get(ics_url)
-
-    # S'assurer de l'encodage UTF-8
-    response.encoding = "UTF-8"
-    
-    if response.ok:
-        ics_content = response.text
-    else:
-        raise Exception("Veuillez entrer un identifiant valide 🚫")
-
-    cal = Calendar(ics_content)
     cours_par_semaine = defaultdict(list)
 
-    local_tz = pytz.timezone("Pacific/Noumea")
-
-    for event in cal.events:
-        start_local = event.begin.astimezone(local_tz)
-        end_local = event.end.astimezone(local_tz)
+    for event in get_events(user_id):
+        start_local = event["begin"]
+        end_local = event["end"]
 
         # Obtenir le numéro de la semaine
         week_num = start_local.isocalendar()[1]
         
-        description_coupee = event.description.split('(')[0].strip()
-        nom_coupee = event.name.split('(')[0].strip()
+        description_coupee = event["description"].split('(')[0].strip()
+        nom_coupee = event["name"].split('(')[0].strip()
 
         # Ajouter le cours à la semaine correspondante
         cours_par_semaine[week_num].append({
@@ -141,31 +338,20 @@ def get_edt_semaine_json(user_id):
         str: Une chaîne JSON représentant les données structurées par semaine.
     """
   
-    ics_url = f"http://applis.univ-nc.nc/cgi-bin/WebObjects/EdtWeb.woa/2/wa/default?login={user_id}%2Fical"
-    response = requests.get(ics_url)
-
-    # S'assurer de l'encodage UTF-8
-    response.encoding = "UTF-8"
-    
-    if response.ok:
-        ics_content = response.text
-    else:
-        raise Exception("Veuillez entrer un identifiant valide 🚫")
-
-    cal = Calendar(ics_content)
     cours_par_semaine = defaultdict(list)
-    local_tz = pytz.timezone("Pacific/Noumea")
+    # Un seul téléchargement pour le JSON et l'EventStore
+    events = get_events(user_id)
 
-    for event in cal.events:
-        start_local = event.begin.astimezone(local_tz)
-        end_local = event.end.astimezone(local_tz)
+    for event in events:
+        start_local = event["begin"]
+        end_local = event["end"]
 
         # Obtenir le numéro de la semaine
         week_num = start_local.isocalendar()[1]
         
         # Extraire les informations spécifiques du nom et description et prof
-        nom_cours = event.name.split('(')[0].strip()
-        description_lignes = event.description.split("\n")        
+        nom_cours = event["name"].split('(')[0].strip()
+        description_lignes = event["description"].split("\n")        
         
         professeur = description_lignes[1].strip() if len(description_lignes) > 1 else 'Inconnu'
 
@@ -196,14 +382,17 @@ def get_edt_semaine_json(user_id):
     cours_json = json.dumps({"emploi_du_temps": emploi_du_temps}, ensure_ascii=False, indent=4)
     
     # Sauvegarder le JSON dans un fichier local
-    directory = "json_schedules"
+    directory = JSON_PATH
     if not os.path.exists(directory):
         os.makedirs(directory)
     
     file_path = os.path.join(directory, f"{user_id}_edt.json")
-    with open(file_path, "w", encoding="utf-8") as file:
-        file.write(cours_json)
+    # Un JSON tronqué serait lu comme un emploi du temps plus court par json_to_documents
+    _write_atomic(file_path, cours_json)
     print(f"Fichier sauvegardé sous : {file_path}")
 
+    # Sauvegarder aussi la version en colonnes, plus compacte et sans dates à re-parser
+    _event_store(user_id, events).save(event_store_path(user_id))
+
     return cours_json
 
@@ -1,8 +1,13 @@
+import json
 import logging
 import os
-import shutil
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from faiss_handler import json_to_documents, retrieve_documents, save_to_faiss
-from scrap_edt import get_edt_semaine_json
+from context_builder import CONTEXT_TOKEN_BUDGET, build_context
+from llm import response_cache
+from scrap_edt import get_edt_semaine_json, get_event_store, load_event_store
 
 ##################SETUP DES LOGS###################
 # Ensure the logs directory exists
@@ -27,22 +32,63 @@ logging.basicConfig(
 def load_and_save_to_faiss_json(user_id):
     get_edt_semaine_json(user_id)
     docs=json_to_documents(user_id)
-    save_to_faiss(docs)
-
-def remove_data(file_path):
-    if os.path.exists(file_path) and os.path.isdir(file_path):
-        try:
-            for file_name in os.listdir(file_path):
-                file_path = os.path.join(file_path, file_name)
-                # Check if it is a file before deleting
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
-                    logging.info(f"{file_name} supprimé" )
-        except Exception as e:
-                logging.error(f"Une erreur est survenu lors de la suppression des fichiers: {e}")
-    else:
-        logging.info(f"Le chemin : '{file_path}' n'existe pas.")
+    # user_id explicite : un emploi du temps devenu vide vide aussi l'index
+    if not save_to_faiss(docs, user_id=user_id):
+        raise Exception(f"Erreur lors de l'enregistrement de l'emploi du temps de {user_id}")
+    # Les réponses en cache ont été calculées sur l'emploi du temps précédent
+    response_cache.invalidate_user(user_id)
 
+def load_and_save_to_faiss_json_batch(user_ids, max_workers=4) -> dict:
+    """
+    Récupère, analyse et enregistre dans FAISS les emplois du temps de plusieurs utilisateurs en parallèle.
+
+    Args:
+        user_ids (list[str]): Les identifiants des utilisateurs.
+        max_workers (int): Le nombre maximum d'utilisateurs traités simultanément.
+
+    Returns:
+        dict: Pour chaque utilisateur, None si tout s'est bien passé, sinon l'exception levée.
+    """
+    user_ids = list(dict.fromkeys(user_ids))  # Un utilisateur présent deux fois n'est traité qu'une fois
+    errors = {}
+    if not user_ids:
+        return errors
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(user_ids))) as executor:
+        futures = {user_id: executor.submit(load_and_save_to_faiss_json, user_id) for user_id in user_ids}
+        for user_id, future in futures.items():
+            try:
+                future.result()
+                errors[user_id] = None
+            except Exception as e:
+                logging.error(f"Erreur lors de la synchronisation de {user_id}: {repr(e)}")
+                errors[user_id] = e
+    return errors
+
+def fetch_event_stores(user_ids, max_workers=4):
+    """
+    Récupère en parallèle les emplois du temps (EventStore) de plusieurs utilisateurs.
+
+    Args:
+        user_ids (list[str]): Les identifiants des utilisateurs.
+        max_workers (int): Le nombre maximum de téléchargements simultanés.
+
+    Returns:
+        tuple[dict, dict]: Les EventStore des utilisateurs récupérés, et pour chaque
+        utilisateur en échec, l'exception levée.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    stores, errors = {}, {}
+    if not user_ids:
+        return stores, errors
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(user_ids))) as executor:
+        futures = {user_id: executor.submit(get_event_store, user_id) for user_id in user_ids}
+        for user_id, future in futures.items():
+            try:
+                stores[user_id] = future.result()
+            except Exception as e:
+                logging.error(f"Erreur lors de la récupération de l'emploi du temps de {user_id}: {repr(e)}")
+                errors[user_id] = e
+    return stores, errors
 
 def filter_data_userId(list_of_dates,user_id)->dict:
     return {
@@ -50,21 +96,75 @@ def filter_data_userId(list_of_dates,user_id)->dict:
         "user_id":user_id
     }
 
-def fetch_and_concatenate_documents(query_text, list_of_dates, user_id, top_k=65):
+# Mots indiquant une question sur l'emploi du temps d'une période : la réponse
+# demande tous les cours de la fenêtre de dates, pas une recherche sémantique.
+# Ils sont cherchés comme mots entiers (éventuellement au pluriel) dans la question
+# normalisée ; les mots trop courants ("jour", "quand") n'en font pas partie.
+WINDOW_KEYWORDS = [
+    "reviser", "revision", "planning", "planifier", "emploi du temps", "edt",
+    "disponible", "dispo", "libre", "creneau", "organiser",
+    "semaine", "journee", "aujourd'hui", "demain", "cours entre", "mes cours",
+]
+_WINDOW_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(keyword).replace(r"\ ", r"\s+") for keyword in WINDOW_KEYWORDS) + r")(?:s|x)?\b"
+)
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", text.lower().replace("’", "'"))
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def is_window_request(query_text) -> bool:
+    """Indique si la question porte sur l'ensemble des cours d'une période."""
+    return _WINDOW_PATTERN.search(_normalize(query_text)) is not None
+
+def fetch_schedule_window(list_of_dates, user_id):
     """
-    Récupère les documents pertinents à partir de FAISS, les concatène et retourne le contexte.
+    Récupère tous les cours d'un utilisateur sur des dates données, sans recherche vectorielle.
+
+    Args:
+        list_of_dates (list[str]): Les dates ISO de la fenêtre.
+        user_id (str): L'identifiant de l'utilisateur.
+
+    Returns:
+        list[dict] | None: Les cours triés par date de début, ou None si l'emploi du
+        temps de l'utilisateur n'a pas été enregistré.
+    """
+    store = load_event_store(user_id)
+    if store is None:
+        return None
+    return store.records(store.on_dates(list_of_dates))
+
+def fetch_and_concatenate_documents(query_text, list_of_dates, user_id, top_k=65, mode="auto",
+                                    token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Récupère les documents pertinents et en construit un contexte compact.
+
+    Une question portant sur une période (voir `is_window_request`) est servie
+    directement depuis l'emploi du temps enregistré, avec tous les cours de la
+    fenêtre dans l'ordre chronologique. Les autres questions passent par la
+    recherche sémantique dans FAISS.
 
     Args:
         query_text (str): Le texte de la requête.
         list_of_dates (list[str]): Liste des dates pour filtrer les documents.
         user_id (str): L'utilisateur pour lequel les documents sont récupérés.
-        top_k (int): Nombre maximum de documents à récupérer.
+        top_k (int): Nombre maximum de documents à récupérer par recherche sémantique.
+        mode (str): "window", "semantic" ou "auto".
+        token_budget (int): Nombre maximum de tokens du contexte (voir `context_builder.build_context`).
 
     Returns:
-        str: Contexte concaténé des documents récupérés.
+        str: Contexte construit à partir des documents récupérés.
     """
     
     try:
+        if mode == "window" or (mode == "auto" and is_window_request(query_text)):
+            window = fetch_schedule_window(list_of_dates, user_id)
+            if window is not None:
+                context = build_context(window, token_budget)
+                logging.info(f"{len(window)} cours récupérés directement pour {user_id} sur {len(list_of_dates)} jour(s)")
+                return context
+            logging.info(f"Aucun emploi du temps enregistré pour {user_id}, recherche sémantique")
+
         # Récupération des documents pertinents
         edt = retrieve_documents(query_text, filter_data_userId(list_of_dates, user_id), user_id, top_k=top_k)
         
@@ -72,8 +172,8 @@ def fetch_and_concatenate_documents(query_text, list_of_dates, user_id, top_k=65
             for doc in edt:
                 logging.info(f"Document récupéré pour {user_id}: \n {doc.page_content}")
             
-            # Concaténation des documents pour former le contexte
-            context = "\n\n".join([doc.page_content for doc in edt])
+            # Contexte compact, groupé par jour, à partir des événements JSON des documents
+            context = build_context([json.loads(doc.page_content) for doc in edt], token_budget)
             logging.info(f"Contexte final pour {user_id}: \n {context}")
             
             return context